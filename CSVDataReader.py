@@ -1,7 +1,8 @@
-import pandas as pd
+from ingest import read_export
 
-# Specify the correct encoding while reading the CSV file with pandas
-df = pd.read_csv("data/MMX_Hackathon2025_year2021.csv", encoding="ISO-8859-1")
+# Read one raw export, detecting its encoding and delimiter.
+# Use ingest.py to combine all yearly exports into the partitioned dataset.
+df = read_export("data/MMX_Hackathon2025_year2021.csv")
 
 # Display the DataFrame (optional)
-print(df)
\ No newline at end of file
+print(df)
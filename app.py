@@ -1,7 +1,16 @@
+import argparse
+import os
 import streamlit as st
 from dashboard import Dashboard
 
 if __name__ == "__main__":
+    # Options come after "--", e.g. streamlit run app.py -- --artifacts-only
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--artifacts-only', action='store_true',
+                        default=os.environ.get('DASHBOARD_MODE') == 'artifacts',
+                        help="Serve forecasts pre-fitted by batch_trainer.py instead of fitting models")
+    args, _ = parser.parse_known_args()
+
     # Create and run the dashboard
-    dashboard = Dashboard()
+    dashboard = Dashboard(artifacts_only=args.artifacts_only)
     dashboard.run() 
\ No newline at end of file
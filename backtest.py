@@ -0,0 +1,156 @@
+"""Rolling-origin backtesting of the segment forecasts.
+
+Usage:
+    python backtest.py --cutoffs 8 --period 14 --horizon 30 --workers 8
+
+For every segment, the model is refitted at several cutoffs spaced `period` days apart.
+Each fit forecasts the next `horizon` days, and the errors are scored across all
+cutoffs and horizons at once. Fits run in parallel worker processes and are cached
+in a model store of their own, sized to hold every fit of the run, so re-running a
+backtest only fits new cutoffs and doesn't evict the dashboard's models.
+"""
+import os
+import argparse
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+from data_processor import DEFAULT_DATA_PATH
+from batch_trainer import ORDER_TYPES, get_data_processor, enumerate_segments
+
+BACKTEST_DIR = 'artifacts/backtests'
+BACKTEST_STORE_DIR = 'data/backtest_models'
+
+def segment_series(data_processor, container_type, hub):
+    """Weekday ds/y series for a segment, as used for training"""
+    daily_counts = data_processor.get_daily_counts(
+        order_types=ORDER_TYPES,
+        container_type=None if container_type == "All" else container_type,
+        hub=None if hub == "All" else hub
+    )
+    series = data_processor.build_daily_series(daily_counts)
+    return series[series['ds'].dt.dayofweek < 5]
+
+def make_cutoffs(series, n_cutoffs, period, horizon):
+    """Cutoff dates, oldest first, leaving a full horizon of actuals after the last one"""
+    last_cutoff = series['ds'].max() - pd.Timedelta(days=horizon)
+    cutoffs = [last_cutoff - pd.Timedelta(days=period * i) for i in range(n_cutoffs)]
+    return sorted(c for c in cutoffs if c > series['ds'].min() + pd.Timedelta(days=365))
+
+def backtest_store(max_entries):
+    """Model store for backtest fits, with the shared store's byte budget per model"""
+    from model_store import ModelStore, DEFAULT_MAX_ENTRIES, DEFAULT_MAX_MB
+
+    max_entries = max(max_entries, DEFAULT_MAX_ENTRIES)
+    return ModelStore(store_dir=BACKTEST_STORE_DIR, max_entries=max_entries,
+                      max_mb=DEFAULT_MAX_MB * max_entries / DEFAULT_MAX_ENTRIES)
+
+def fit_cutoff(data_path, container_type, hub, cutoff, horizon, profile='accurate', store_entries=0):
+    """Fit on data up to a cutoff and return the forecasts for the following horizon days"""
+    from forecaster import Forecaster
+
+    data_processor = get_data_processor(data_path)
+    series = segment_series(data_processor, container_type, hub)
+    train_df = series[series['ds'] <= cutoff].copy()
+    train_df['cap'] = train_df['y'].max() * 1.5
+    train_df['floor'] = 0
+
+    # Fits are cached in the model store, so repeated backtests reuse them
+    forecaster = Forecaster(holiday_df=data_processor.get_holiday_data(hub=hub), store=backtest_store(store_entries),
+                            segment=(container_type, hub), profile=profile)
+    forecaster.create_model(train_df)
+    forecast = forecaster.make_forecast(train_df, forecast_period=horizon)
+
+    future = forecast[(forecast['ds'] > cutoff) & (forecast['ds'] <= cutoff + pd.Timedelta(days=horizon))]
+    result = future[['ds', 'yhat']].merge(series, on='ds', how='inner')
+    result['cutoff'] = cutoff
+    result['container_type'] = container_type
+    result['hub_location'] = hub
+    result['profile'] = profile
+    return result
+
+def score(results, horizon):
+    """Score all cutoffs and horizons at once from a (segment, cutoff, day) long frame
+
+    Returns per-segment metrics and per-segment, per-horizon-day metrics.
+    """
+    from forecaster import forecast_errors
+
+    results = results.copy()
+    results['h'] = (results['ds'] - results['cutoff']).dt.days
+    summary_rows, horizon_rows = [], []
+    for (container_type, hub), group in results.groupby(['container_type', 'hub_location']):
+        # (cutoffs x horizon days) matrices; days without a forecast stay NaN
+        days = range(1, horizon + 1)
+        y = group.pivot_table(index='cutoff', columns='h', values='y').reindex(columns=days)
+        yhat = group.pivot_table(index='cutoff', columns='h', values='yhat').reindex(index=y.index, columns=days)
+
+        overall = forecast_errors(y.values, yhat.values)
+        summary_rows.append(dict(container_type=container_type, hub_location=hub, profile=group['profile'].iloc[0],
+                                 cutoffs=len(y), **{k: float(v) for k, v in overall.items()}))
+
+        by_horizon = forecast_errors(y.values, yhat.values, axis=0)
+        horizon_rows.append(pd.DataFrame(dict(container_type=container_type, hub_location=hub,
+                                              h=y.columns, **by_horizon)))
+    summary = pd.DataFrame(summary_rows)
+    by_horizon = pd.concat(horizon_rows, ignore_index=True) if horizon_rows else pd.DataFrame()
+    # Weekend horizon days have no actuals
+    if not by_horizon.empty:
+        by_horizon = by_horizon.dropna(subset=['mae'])
+    return summary, by_horizon
+
+def run_backtest(data_path=DEFAULT_DATA_PATH, segments=None, n_cutoffs=8, period=14, horizon=30,
+                 workers=None, output_dir=BACKTEST_DIR, profile='accurate'):
+    """Backtest segments over rolling cutoffs in parallel and write the scores"""
+    data_processor = get_data_processor(data_path)
+    segments = segments or enumerate_segments(data_processor)
+
+    jobs = []
+    for container_type, hub in segments:
+        series = segment_series(data_processor, container_type, hub)
+        for cutoff in make_cutoffs(series, n_cutoffs, period, horizon):
+            jobs.append((data_path, container_type, hub, cutoff, horizon, profile))
+    print(f"{len(segments)} segments, {len(jobs)} cutoff fits")
+    # The store keeps every fit of the run, so none is evicted before a re-run
+    jobs = [job + (len(jobs),) for job in jobs]
+
+    # Forked workers inherit the loaded dataset instead of reloading it
+    ctx = mp.get_context('fork') if 'fork' in mp.get_all_start_methods() else None
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as executor:
+        results = list(executor.map(fit_cutoff, *zip(*jobs))) if jobs else []
+    if not results:
+        return pd.DataFrame(), pd.DataFrame()
+
+    results = pd.concat(results, ignore_index=True)
+    summary, by_horizon = score(results, horizon)
+
+    os.makedirs(output_dir, exist_ok=True)
+    results.to_parquet(os.path.join(output_dir, 'forecasts.parquet'), index=False)
+    summary.to_csv(os.path.join(output_dir, 'summary.csv'), index=False)
+    by_horizon.to_csv(os.path.join(output_dir, 'by_horizon.csv'), index=False)
+    return summary, by_horizon
+
+def main():
+    parser = argparse.ArgumentParser(description="Rolling-origin backtest of every segment forecast")
+    parser.add_argument('--data-path', default=DEFAULT_DATA_PATH)
+    parser.add_argument('--container-type', default=None, help="Backtest a single segment")
+    parser.add_argument('--hub', default=None, help="Backtest a single segment")
+    parser.add_argument('--cutoffs', type=int, default=8, help="Number of rolling cutoffs per segment")
+    parser.add_argument('--period', type=int, default=14, help="Days between cutoffs")
+    parser.add_argument('--horizon', type=int, default=30, help="Days forecast after each cutoff")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--output-dir', default=BACKTEST_DIR)
+    parser.add_argument('--profile', default='accurate', choices=['fast', 'balanced', 'accurate'],
+                        help="Forecast fidelity profile")
+    args = parser.parse_args()
+
+    segments = None
+    if args.container_type or args.hub:
+        segments = [(args.container_type or "All", args.hub or "All")]
+    summary, _ = run_backtest(args.data_path, segments, args.cutoffs, args.period, args.horizon,
+                              args.workers, args.output_dir, args.profile)
+    if not summary.empty:
+        print(summary.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""Offline batch trainer that pre-fits every container type x hub location forecast.
+
+Usage:
+    python batch_trainer.py --workers 8 --timeout 600
+
+Each segment (including the "All" rollups) is fitted in its own worker process and
+written to the artifacts directory. Segments whose training data and parameters have
+not changed since the last run are skipped, so a crashed run can simply be restarted.
+"""
+import os
+import re
+import json
+import time
+import argparse
+import multiprocessing as mp
+import pandas as pd
+
+from data_processor import DataProcessor, DEFAULT_DATA_PATH
+from model_store import hash_frame
+
+ARTIFACTS_DIR = 'artifacts/forecasts'
+ORDER_TYPES = ['S', 'W', 'T']
+FORECAST_PERIOD = 45
+
+# Loaded once in the parent; forked workers inherit it instead of reloading
+_data_processor = None
+
+def segment_slug(container_type, hub):
+    """Directory name for a segment's artifacts"""
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', f"{container_type}__{hub}")
+
+def artifact_dir(container_type, hub, output_dir=ARTIFACTS_DIR):
+    return os.path.join(output_dir, segment_slug(container_type, hub))
+
+def load_artifact(container_type, hub, output_dir=ARTIFACTS_DIR):
+    """Return (train_df, val_df, forecast, metrics) for a pre-fitted segment, or None"""
+    path = artifact_dir(container_type, hub, output_dir)
+    try:
+        with open(os.path.join(path, 'metrics.json')) as f:
+            metrics = json.load(f)
+        history = pd.read_parquet(os.path.join(path, 'history.parquet'))
+        forecast = pd.read_parquet(os.path.join(path, 'forecast.parquet'))
+    except (OSError, ValueError):
+        return None
+    train_df = history[history['split'] == 'train'].drop(columns='split')
+    val_df = history[history['split'] == 'validation'].drop(columns='split')
+    return train_df, val_df, forecast, metrics
+
+def get_data_processor(data_path):
+    global _data_processor
+    if _data_processor is None or _data_processor.data_path != data_path or _data_processor.has_new_data():
+        _data_processor = DataProcessor(data_path=data_path)
+        if _data_processor.load_data() is None:
+            raise RuntimeError(f"Could not load data from {data_path}")
+    return _data_processor
+
+def enumerate_segments(data_processor):
+    """Every container type x hub location combination, including the "All" rollups"""
+    container_types = ["All"] + data_processor.get_dimension_values('container_type', order_types=ORDER_TYPES)
+    hub_locations = ["All"] + data_processor.get_dimension_values('hub_location', order_types=ORDER_TYPES)
+    return [(c, h) for c in container_types for h in hub_locations]
+
+def prepare_segment(data_processor, container_type, hub):
+    """Training and validation frames for one segment, exactly as the dashboard builds them"""
+    daily_counts = data_processor.get_daily_counts(
+        order_types=ORDER_TYPES,
+        container_type=None if container_type == "All" else container_type,
+        hub=None if hub == "All" else hub
+    )
+    return data_processor.prepare_forecast_data(daily_counts)
+
+def segment_fingerprint(train_df, val_df, holiday_df, forecast_period, profile='accurate'):
+    """Identifies the inputs of a segment fit so unchanged segments can be skipped"""
+    from forecaster import DEFAULT_PARAMS
+    return hash_frame(pd.DataFrame({
+        'part': ['train', 'validation', 'holidays', 'params'],
+        'hash': [
+            hash_frame(train_df),
+            hash_frame(val_df),
+            hash_frame(holiday_df),
+            json.dumps(dict(DEFAULT_PARAMS, forecast_period=forecast_period, profile=profile), sort_keys=True)
+        ]
+    }))
+
+def is_up_to_date(path, fingerprint):
+    try:
+        with open(os.path.join(path, 'metrics.json')) as f:
+            return json.load(f).get('fingerprint') == fingerprint
+    except (OSError, ValueError):
+        return False
+
+def train_segment(data_path, container_type, hub, output_dir, forecast_period, incremental=False,
+                  profile='accurate'):
+    """Fit one segment and write its forecast, history and metrics artifacts
+
+    With incremental=True the fit is warm-started from the segment's previous model.
+    profile is the forecast fidelity profile; the nightly batch runs the accurate one.
+    """
+    from forecaster import Forecaster
+    from model_store import model_store
+
+    data_processor = get_data_processor(data_path)
+    train_df, val_df = prepare_segment(data_processor, container_type, hub)
+    holiday_df = data_processor.get_holiday_data(hub=hub)
+    fingerprint = segment_fingerprint(train_df, val_df, holiday_df, forecast_period, profile)
+
+    start = time.time()
+    forecaster = Forecaster(holiday_df=holiday_df, store=model_store, segment=(container_type, hub),
+                            warm_start=incremental, profile=profile)
+    forecaster.create_model(train_df)
+    forecast = forecaster.make_forecast(train_df, forecast_period=forecast_period)
+    mape, rmse = forecaster.calculate_metrics(val_df)
+
+    path = artifact_dir(container_type, hub, output_dir)
+    os.makedirs(path, exist_ok=True)
+    history = pd.concat([
+        train_df[['ds', 'y']].assign(split='train'),
+        val_df[['ds', 'y']].assign(split='validation')
+    ])
+    history.to_parquet(os.path.join(path, 'history.parquet'), index=False)
+    forecast.to_parquet(os.path.join(path, 'forecast.parquet'), index=False)
+    metrics = {
+        'container_type': container_type,
+        'hub_location': hub,
+        'fingerprint': fingerprint,
+        'forecast_period': forecast_period,
+        'profile': profile,
+        'mape': None if mape is None else float(mape),
+        'rmse': None if rmse is None else float(rmse),
+        'fit_seconds': round(time.time() - start, 3),
+        'from_store': forecaster.from_store,
+        'warm_started': forecaster.warm_started,
+        'trained_at': pd.Timestamp.now().isoformat()
+    }
+    # metrics.json is written last and marks the segment as complete
+    with open(os.path.join(path, 'metrics.json.tmp'), 'w') as f:
+        json.dump(metrics, f, indent=2)
+    os.replace(os.path.join(path, 'metrics.json.tmp'), os.path.join(path, 'metrics.json'))
+
+def _run_job(data_path, container_type, hub, output_dir, forecast_period, incremental, profile):
+    try:
+        train_segment(data_path, container_type, hub, output_dir, forecast_period, incremental, profile)
+    except Exception as e:
+        print(f"Segment {container_type}/{hub} failed: {str(e)}")
+        raise SystemExit(1)
+
+def run_batch(data_path=DEFAULT_DATA_PATH, output_dir=ARTIFACTS_DIR, workers=None,
+              timeout=600, forecast_period=FORECAST_PERIOD, force=False, incremental=False, profile='accurate'):
+    """Fit every segment in parallel worker processes, skipping segments that are up to date
+
+    Only segments whose data changed are refitted. With incremental=True those fits are
+    warm-started from the previous model instead of starting cold.
+    """
+    data_processor = get_data_processor(data_path)
+    segments = enumerate_segments(data_processor)
+
+    pending = []
+    for container_type, hub in segments:
+        train_df, val_df = prepare_segment(data_processor, container_type, hub)
+        holiday_df = data_processor.get_holiday_data(hub=hub)
+        fingerprint = segment_fingerprint(train_df, val_df, holiday_df, forecast_period, profile)
+        if force or not is_up_to_date(artifact_dir(container_type, hub, output_dir), fingerprint):
+            pending.append((container_type, hub))
+    print(f"{len(segments)} segments, {len(segments) - len(pending)} up to date, {len(pending)} to fit")
+
+    # A separate process per job lets us kill jobs that exceed the timeout
+    ctx = mp.get_context('fork') if 'fork' in mp.get_all_start_methods() else mp.get_context()
+    workers = workers or os.cpu_count() or 1
+    running = {}
+    results = {}
+    while pending or running:
+        while pending and len(running) < workers:
+            container_type, hub = pending.pop(0)
+            process = ctx.Process(
+                target=_run_job,
+                args=(data_path, container_type, hub, output_dir, forecast_period, incremental, profile)
+            )
+            process.start()
+            running[(container_type, hub)] = (process, time.time())
+
+        time.sleep(0.1)
+        for segment, (process, started) in list(running.items()):
+            if process.is_alive():
+                if time.time() - started > timeout:
+                    process.terminate()
+                    process.join()
+                    results[segment] = 'timeout'
+                    del running[segment]
+                    print(f"{segment[0]}/{segment[1]}: timeout")
+                continue
+            process.join()
+            results[segment] = 'ok' if process.exitcode == 0 else 'failed'
+            del running[segment]
+            print(f"{segment[0]}/{segment[1]}: {results[segment]}")
+
+    write_index(output_dir)
+    return results
+
+def write_index(output_dir=ARTIFACTS_DIR):
+    """Summarize every segment's metrics in one index file"""
+    rows = []
+    if os.path.isdir(output_dir):
+        for name in sorted(os.listdir(output_dir)):
+            metrics_path = os.path.join(output_dir, name, 'metrics.json')
+            if os.path.exists(metrics_path):
+                with open(metrics_path) as f:
+                    rows.append(json.load(f))
+        with open(os.path.join(output_dir, 'index.json'), 'w') as f:
+            json.dump(rows, f, indent=2)
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fit forecasts for every container type x hub location")
+    parser.add_argument('--data-path', default=DEFAULT_DATA_PATH)
+    parser.add_argument('--output-dir', default=ARTIFACTS_DIR)
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--timeout', type=float, default=600, help="Seconds before a segment fit is killed")
+    parser.add_argument('--forecast-period', type=int, default=FORECAST_PERIOD)
+    parser.add_argument('--force', action='store_true', help="Refit segments even if they are up to date")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Warm-start changed segments from their previous fit (for daily refreshes)")
+    parser.add_argument('--profile', default='accurate', choices=['fast', 'balanced', 'accurate'],
+                        help="Forecast fidelity profile")
+    args = parser.parse_args()
+
+    results = run_batch(
+        data_path=args.data_path,
+        output_dir=args.output_dir,
+        workers=args.workers,
+        timeout=args.timeout,
+        forecast_period=args.forecast_period,
+        force=args.force,
+        incremental=args.incremental,
+        profile=args.profile
+    )
+    failed = [segment for segment, status in results.items() if status != 'ok']
+    if failed:
+        print(f"{len(failed)} segments did not finish: {failed}")
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
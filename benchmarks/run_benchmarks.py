@@ -0,0 +1,150 @@
+"""Time the dashboard pipeline on synthetic data at several scales.
+
+Usage:
+    python -m benchmarks.run_benchmarks --base-rows 100000 --scales 1 10 100 --profile accurate
+
+Each run is saved to benchmarks/results/ as JSON, together with the forecast profile
+that produced its fit and predict timings, and compared with the previous run of the
+same profile.
+"""
+import os
+import gc
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+
+from benchmarks.synthetic_data import write_combined_csv
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+ORDER_TYPES = ['S', 'W', 'T']
+
+def timed(results, stage, fn, *args, **kwargs):
+    """Run fn, record its wall time under stage and return its result"""
+    gc.collect()
+    start = time.perf_counter()
+    value = fn(*args, **kwargs)
+    results[stage] = round(time.perf_counter() - start, 4)
+    return value
+
+def benchmark_scale(n_rows, workdir, fit=True, profile='accurate'):
+    """Time each pipeline stage on n_rows synthetic orders"""
+    from data_processor import DataProcessor
+    from frame_cache import frame_cache
+    from shared_dataset import SharedDataset
+
+    results = {}
+    csv_path = os.path.join(workdir, f"combined_{n_rows}.csv")
+    timed(results, 'generate', write_combined_csv, csv_path, n_rows)
+
+    frame_cache.clear()
+    cache_dir = os.path.join(workdir, f"cache_{n_rows}")
+    # Private copies, so these stages keep timing the CSV and Parquet cache reads
+    data_processor = DataProcessor(data_path=csv_path, cache_dir=cache_dir, shared=False)
+    timed(results, 'load_cold', data_processor.load_data)
+    data_processor = DataProcessor(data_path=csv_path, cache_dir=cache_dir, shared=False)
+    df = timed(results, 'load_cached', data_processor.load_data)
+    # Publishing the shared dataset, then mapping it as another process would
+    shared_processor = DataProcessor(data_path=csv_path, cache_dir=cache_dir, shared=True)
+    timed(results, 'publish_shared', shared_processor.load_data)
+    timed(results, 'attach_shared', SharedDataset.attach, shared_processor.shared_path())
+
+    df_filtered = timed(results, 'filter', data_processor.filter_data, order_types=ORDER_TYPES)
+    df_filtered = df_filtered.drop(columns='time_of_day')
+    timed(results, 'add_time_of_day', data_processor.add_time_of_day, df_filtered)
+
+    df_morning = data_processor.get_filtered_data(order_types=ORDER_TYPES)
+    timed(results, 'prepare_forecast_data_rows', data_processor.prepare_forecast_data, df_morning)
+    timed(results, 'demand_cube', data_processor.get_demand_cube)
+    daily_counts = timed(results, 'cube_slice', data_processor.get_daily_counts, order_types=ORDER_TYPES)
+    train_df, val_df = timed(results, 'prepare_forecast_data', data_processor.prepare_forecast_data, daily_counts)
+    holiday_df = timed(results, 'holidays', data_processor.get_holiday_data)
+
+    if fit:
+        from forecaster import Forecaster
+        from functions.charts import create_forecast_chart
+
+        forecaster = Forecaster(holiday_df=holiday_df, profile=profile)
+        timed(results, 'prophet_fit', forecaster.create_model, train_df)
+        forecast = timed(results, 'prophet_predict', forecaster.make_forecast, train_df)
+        timed(results, 'prophet_predict_analytic', forecaster.make_forecast, train_df, uncertainty_samples=0)
+        timed(results, 'forecast_chart', create_forecast_chart, train_df, val_df, forecast, "Benchmark")
+        timed(results, 'forecast_chart_all_history_webgl', create_forecast_chart, train_df, val_df, forecast,
+              "Benchmark", window_start=train_df['ds'].min(), mode='webgl')
+
+    results['rows'] = int(len(df))
+    memory = data_processor.memory_report(df)
+    results['frame_mb'] = round(memory.loc['total', 'bytes'] / 1024 / 1024, 2)
+    results['frame_mb_default_dtypes'] = round(memory.loc['total', 'default_bytes'] / 1024 / 1024, 2)
+    return results
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def previous_run(results_dir=RESULTS_DIR, profile='accurate'):
+    """The most recent saved run of a forecast profile, or None"""
+    if not os.path.isdir(results_dir):
+        return None
+    for name in sorted((name for name in os.listdir(results_dir) if name.endswith('.json')), reverse=True):
+        with open(os.path.join(results_dir, name)) as f:
+            run = json.load(f)
+        # Runs from before profiles existed used the accurate settings
+        if run.get('profile', 'accurate') == profile:
+            return run
+    return None
+
+def print_comparison(run, baseline):
+    """Print each stage's time (or the frame's memory), and its ratio to the baseline run where available"""
+    print(f"Forecast profile: {run['profile']}")
+    for scale, stages in run['scales'].items():
+        print(f"\n{scale}x ({stages['rows']} rows)")
+        base_stages = (baseline or {}).get('scales', {}).get(scale, {})
+        for stage, seconds in stages.items():
+            if stage == 'rows':
+                continue
+            unit = ' MB' if stage.startswith('frame_mb') else 's'
+            line = f"  {stage:<28}{seconds:>10.4f}{unit}"
+            if base_stages.get(stage):
+                line += f"  ({seconds / base_stages[stage]:.2f}x vs {baseline.get('commit') or 'previous'})"
+            print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard pipeline on synthetic data")
+    parser.add_argument('--base-rows', type=int, default=100_000, help="Rows at scale 1x")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--no-fit', action='store_true', help="Skip the Prophet and chart stages")
+    parser.add_argument('--results-dir', default=RESULTS_DIR)
+    parser.add_argument('--profile', default='accurate', choices=['fast', 'balanced', 'accurate'],
+                        help="Forecast profile used for the fit and predict stages")
+    args = parser.parse_args()
+
+    baseline = previous_run(args.results_dir, args.profile)
+    run = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'base_rows': args.base_rows,
+        'profile': args.profile,
+        'scales': {}
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in args.scales:
+            run['scales'][str(scale)] = benchmark_scale(args.base_rows * scale, workdir, fit=not args.no_fit,
+                                                         profile=args.profile)
+
+    os.makedirs(args.results_dir, exist_ok=True)
+    path = os.path.join(args.results_dir, f"{run['timestamp'].replace(':', '')}.json")
+    with open(path, 'w') as f:
+        json.dump(run, f, indent=2)
+    print_comparison(run, baseline)
+    print(f"\nSaved {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Measure the dashboard's cold start against a time budget.
+
+Usage:
+    python -m benchmarks.startup --budget 3.0
+
+Each probe runs in a fresh interpreter. The first times importing the dashboard and
+lists the heavy libraries that the import pulls in. The second renders app.py once
+with Streamlit's app tester and reads the stage timings of that first rerun from the
+diagnostics log. The command exits with status 1 when import plus first render
+exceeds the budget.
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET_SECONDS = float(os.environ.get('STARTUP_BUDGET_SECONDS', 3.0))
+# Libraries that should only be imported once a forecast or chart is needed
+DEFERRED_MODULES = ['prophet', 'cmdstanpy', 'plotly', 'holidays', 'PIL', 'matplotlib']
+
+IMPORT_PROBE = """
+import sys, json, time
+start = time.perf_counter()
+import streamlit
+framework = time.perf_counter() - start
+before = set(sys.modules)
+start = time.perf_counter()
+import dashboard
+seconds = time.perf_counter() - start
+loaded = [m for m in json.loads(sys.argv[1]) if m in sys.modules and m not in before]
+print(json.dumps({'streamlit': framework, 'dashboard': seconds, 'loaded': loaded}))
+"""
+
+RENDER_PROBE = """
+import sys, json, time
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(sys.argv[1], default_timeout=float(sys.argv[2]))
+start = time.perf_counter()
+app.run()
+print(json.dumps({'complete': time.perf_counter() - start, 'exceptions': [e.value for e in app.exception]}))
+"""
+
+def run_probe(code, *args, env=None):
+    """Run a probe in a fresh interpreter and return the JSON it prints"""
+    result = subprocess.run([sys.executable, '-c', code, *args], cwd=REPO_DIR, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "probe failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def first_rerun_spans(log_path):
+    """Spans of the first dashboard rerun in a timings log, by name"""
+    with open(log_path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if not records:
+        return {}
+    first = records[0]['trace_id']
+    return {r['name']: r for r in records if r['trace_id'] == first}
+
+def profile_startup(timeout=600):
+    """Import and first-render timings of a cold dashboard process"""
+    report = run_probe(IMPORT_PROBE, json.dumps(DEFERRED_MODULES))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        log_path = os.path.join(workdir, 'timings.jsonl')
+        env = dict(os.environ, DASHBOARD_TIMINGS_LOG=log_path)
+        render = run_probe(RENDER_PROBE, os.path.join(REPO_DIR, 'app.py'), str(timeout), env=env)
+        spans = first_rerun_spans(log_path) if os.path.exists(log_path) else {}
+
+    report['complete'] = render['complete']
+    report['exceptions'] = render['exceptions']
+    if 'rerun' in spans:
+        report['first_render'] = spans['rerun']['seconds']
+    if 'filter' in spans:
+        # Header, dropdowns and the filtered data are on the page
+        report['filters_ready'] = spans['filter']['offset'] + spans['filter']['seconds']
+    report['stages'] = {name: span['seconds'] for name, span in spans.items() if span['depth'] == 1}
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile dashboard import and first-render time")
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET_SECONDS,
+                        help="Seconds allowed for importing the dashboard plus its first render")
+    parser.add_argument('--timeout', type=float, default=600, help="Seconds to wait for the render")
+    args = parser.parse_args()
+
+    report = profile_startup(timeout=args.timeout)
+    print(f"{'streamlit import':<24}{report['streamlit']:>9.3f}s")
+    print(f"{'dashboard import':<24}{report['dashboard']:>9.3f}s")
+    if 'filters_ready' in report:
+        print(f"{'header and filters':<24}{report['filters_ready']:>9.3f}s")
+    if 'first_render' in report:
+        print(f"{'first render':<24}{report['first_render']:>9.3f}s")
+    print(f"{'until forecast shown':<24}{report['complete']:>9.3f}s")
+    for name, seconds in report['stages'].items():
+        print(f"  {name:<22}{seconds:>9.3f}s")
+    if report['loaded']:
+        print(f"Heavy libraries imported at startup: {', '.join(report['loaded'])}")
+    for exception in report['exceptions']:
+        print(f"Exception while rendering: {exception}")
+
+    total = report['dashboard'] + report.get('first_render', report['complete'])
+    status = "within" if total <= args.budget else "over"
+    print(f"\nImport + first render {total:.3f}s, {status} the {args.budget:.3f}s budget")
+    sys.exit(0 if total <= args.budget else 1)
+
+if __name__ == "__main__":
+    main()
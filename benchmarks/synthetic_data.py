@@ -0,0 +1,75 @@
+"""Synthetic order data in the raw combined.csv schema, for benchmarking without the real export."""
+import numpy as np
+import pandas as pd
+
+from data_processor import COLUMN_MAPPING
+
+ORDER_TYPES = ['H', 'L', 'R', 'S', 'T', 'W']
+ORDER_TYPE_WEIGHTS = [0.19, 0.12, 0.08, 0.19, 0.05, 0.37]
+CUSTOMER_TYPES = ['Firma', 'Privat', 'Verein', 'AöR/KöR']
+HUBS = ['HH', 'KIE', 'SME', 'NMS', 'LBK', 'HEI', 'ELM', 'PIN']
+CITIES = ['Hamburg', 'Kiel', 'Itzehoe', 'Neumünster', 'Lübeck', 'Heide', 'Elmshorn', 'Pinneberg',
+          'Nortorf', 'Wedel', 'Tornesch', 'Glückstadt', 'Meldorf', 'Lägerdorf']
+WASTE_TYPES = ['Bauschutt', 'Baumischabfall', 'Holz', 'Grünschnitt', 'Sperrmüll', 'Boden', 'Papier', 'Schrott']
+
+def generate_orders(n_rows=100_000, n_container_types=12, n_hubs=3, n_vehicles=60,
+                    start='2021-01-04', end='2025-03-31', seed=0):
+    """Raw order rows with the columns of DataProcessor's COLUMN_MAPPING
+
+    Deliveries fall on weekdays with weekly and yearly seasonality. About 30% of the
+    delivery time windows are missing, as in the real exports.
+    """
+    rng = np.random.default_rng(seed)
+    days = pd.date_range(start, end, freq='B')
+    # Busier in spring/summer and at the start of the week
+    weights = np.asarray((1 + 0.3 * np.sin(2 * np.pi * (days.dayofyear - 80) / 365.25))
+                         * (1.2 - 0.05 * days.dayofweek))
+    delivery_date = days[rng.choice(len(days), size=n_rows, p=weights / weights.sum())]
+
+    earliest_hour = rng.integers(6, 15, size=n_rows)
+    latest_hour = np.minimum(earliest_hour + rng.integers(0, 6, size=n_rows), 18)
+    has_window = rng.random(n_rows) > 0.3
+    earliest = (pd.Series(earliest_hour).astype(str).str.zfill(2) + ':00:00').where(has_window)
+    latest = (pd.Series(latest_hour).astype(str).str.zfill(2) + ':00:00').where(has_window)
+
+    container_types = [f"C{i:02d}" for i in range(1, n_container_types + 1)]
+    hubs = HUBS[:n_hubs] if n_hubs <= len(HUBS) else [f"H{i:02d}" for i in range(n_hubs)]
+    vehicles = [f"{i:04d}" for i in range(n_vehicles)]
+    order_type = rng.choice(ORDER_TYPES, size=n_rows, p=ORDER_TYPE_WEIGHTS)
+    zipcodes = rng.integers(20000, 26000, size=200).astype(float)
+
+    lead_days = rng.integers(0, 14, size=n_rows)
+    order_datetime = (delivery_date - pd.to_timedelta(lead_days, unit='D')
+                      + pd.to_timedelta(rng.integers(6 * 3600, 18 * 3600, size=n_rows), unit='s'))
+
+    df = pd.DataFrame({
+        'LiefZeitV': earliest,
+        'LiefZeitB': latest,
+        'LiefKWJ': delivery_date.isocalendar().year.to_numpy(),
+        'Monat': delivery_date.month,
+        'LiefDatum': delivery_date.strftime('%Y-%m-%d'),
+        'CVgId': 6_000_000 + np.arange(n_rows),
+        'Typ': rng.choice(CUSTOMER_TYPES, size=n_rows, p=[0.7, 0.27, 0.02, 0.01]),
+        'LoAdrId': rng.integers(1_000_000, 2_400_000, size=n_rows),
+        'LoPlz': rng.choice(zipcodes, size=n_rows),
+        'LoOrt': rng.choice(CITIES, size=n_rows),
+        'DspGrpKz': rng.choice(['M', 'C'], size=n_rows),
+        'DspZenKz': rng.choice(hubs, size=n_rows),
+        'AArtKz': order_type,
+        'ConTyp': rng.choice(container_types, size=n_rows),
+        'CSAnz': np.where(np.isin(order_type, ['S', 'W', 'T']), rng.integers(1, 3, size=n_rows), 0),
+        'CHAnz': np.where(np.isin(order_type, ['H', 'W', 'T']), rng.integers(1, 3, size=n_rows), 0),
+        'FzgNr': rng.choice(vehicles, size=n_rows),
+        'Bez': rng.choice(WASTE_TYPES, size=n_rows),
+        'Plz': rng.choice(np.append(zipcodes[:20], np.nan), size=n_rows),
+        'Ort': rng.choice(CITIES, size=n_rows),
+        'AddDatum': order_datetime.strftime('%Y-%m-%d %H:%M:%S'),
+        'EntPlz': rng.choice(np.append(zipcodes[:20], np.nan), size=n_rows),
+        'EntOrt': rng.choice(CITIES, size=n_rows)
+    })
+    return df[list(COLUMN_MAPPING)].sort_values('LiefDatum', kind='stable').reset_index(drop=True)
+
+def write_combined_csv(path, n_rows=100_000, **kwargs):
+    """Write a synthetic combined.csv and return its path"""
+    generate_orders(n_rows, **kwargs).to_csv(path, index=False)
+    return path
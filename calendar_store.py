@@ -0,0 +1,99 @@
+import os
+import numpy as np
+import pandas as pd
+
+from frame_cache import frame_cache
+
+# Daily calendars per federal state and year range, computed once and kept on disk
+CALENDAR_DIR = 'data/cache/calendar'
+CALENDAR_VERSION = 1
+
+# Federal state of each hub; selections across hubs use the national holidays
+HUB_STATES = {
+    'HH': 'HH',
+    'KIE': 'SH',
+    'SME': 'SH'
+}
+
+BRIDGE_DAY = 'Brückentag'
+HOLIDAY_PRIOR_SCALE = 10.0  # Stronger holiday effects
+
+def hub_state(hub):
+    """Federal state code of a hub, or None for national holidays"""
+    return HUB_STATES.get(hub)
+
+def build_calendar(state, start_year, end_year):
+    """One row per day with holiday flags and names, bridge days, weekday and ISO week"""
+    import holidays
+
+    days = pd.date_range(f"{start_year}-01-01", f"{end_year}-12-31", freq='D')
+    named = holidays.Germany(subdiv=state, years=range(start_year, end_year + 1))
+    names = pd.Series(list(named.values()), index=pd.to_datetime(list(named.keys())), dtype=object)
+
+    calendar = pd.DataFrame({'ds': days})
+    calendar['holiday'] = pd.Categorical(names.reindex(days).to_numpy())
+    calendar['is_holiday'] = calendar['holiday'].notna().to_numpy()
+    calendar['weekday'] = days.dayofweek.astype('int8')
+    calendar['iso_week'] = days.isocalendar().week.to_numpy().astype('int8')
+
+    # A bridge day is a single workday between a holiday and another day off
+    off = (calendar['weekday'] >= 5).to_numpy() | calendar['is_holiday'].to_numpy()
+    holiday = calendar['is_holiday'].to_numpy()
+    before_off = np.r_[False, off[:-1]]
+    after_off = np.r_[off[1:], False]
+    next_to_holiday = np.r_[False, holiday[:-1]] | np.r_[holiday[1:], False]
+    calendar['is_bridge_day'] = ~off & before_off & after_off & next_to_holiday
+    calendar['is_workday'] = ~off
+    return calendar
+
+class CalendarStore:
+    def __init__(self, cache_dir=CALENDAR_DIR):
+        self.cache_dir = cache_dir
+
+    def _path(self, state, start_year, end_year):
+        return os.path.join(self.cache_dir, f"calendar_v{CALENDAR_VERSION}_{state or 'DE'}_{start_year}_{end_year}.parquet")
+
+    def calendar(self, state=None, start_year=2020, end_year=2025):
+        """Daily calendar for a state and year range, memoized in memory and on disk
+
+        The returned frame is shared, so callers must not modify it in place.
+        """
+        key = ('calendar', CALENDAR_VERSION, state, start_year, end_year)
+        return frame_cache.get_or_compute(key, lambda: self._load_or_build(state, start_year, end_year))
+
+    def _load_or_build(self, state, start_year, end_year):
+        path = self._path(state, start_year, end_year)
+        if os.path.exists(path):
+            try:
+                return pd.read_parquet(path)
+            except Exception as e:
+                print(f"Could not read calendar {path}: {str(e)}")
+        calendar = build_calendar(state, start_year, end_year)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            calendar.to_parquet(path + '.tmp', index=False)
+            os.replace(path + '.tmp', path)
+        except Exception as e:
+            print(f"Could not write calendar: {str(e)}")
+        return calendar
+
+    def holidays(self, state=None, start_year=2020, end_year=2025):
+        """Prophet holiday table with the state's holidays and bridge days"""
+        key = ('holiday_table', CALENDAR_VERSION, state, start_year, end_year)
+
+        def compute():
+            calendar = self.calendar(state, start_year, end_year)
+            days = calendar[calendar['is_holiday'] | calendar['is_bridge_day']]
+            holiday_df = pd.DataFrame({
+                'ds': days['ds'].to_numpy(),
+                'holiday': np.where(days['is_holiday'], days['holiday'].astype(object), BRIDGE_DAY),
+                'lower_window': 0,
+                'upper_window': 0
+            })
+            holiday_df['prior_scale'] = HOLIDAY_PRIOR_SCALE
+            return holiday_df
+
+        return frame_cache.get_or_compute(key, compute)
+
+# Shared instance used by the data processor
+calendar_store = CalendarStore()
@@ -1,16 +1,58 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import numpy as np
+import time
+import uuid
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
 from functions.ui import load_css, display_header, display_footer
 from functions.charts import create_branded_chart, create_forecast_chart
 from data_processor import DataProcessor
-from forecaster import Forecaster
+from forecaster import Forecaster, DEFAULT_PARAMS, next_day_forecast, forecast_name
+from model_store import model_store
+from forecast_jobs import forecast_jobs, fit_forecast
+from hierarchy import HierarchicalForecaster
+from batch_trainer import ARTIFACTS_DIR, load_artifact
+from diagnostics import start_trace, span, display_diagnostics
+
+# Columns the dashboard views actually use; the rest stay on disk
+DASHBOARD_COLUMNS = [
+    'delivery_date',
+    'time_of_day',
+    'order_type',
+    'container_type',
+    'hub_location',
+    'containers_delivered',
+    'containers_picked_up'
+]
+
+# Forecaster backends offered in the sidebar, the default first
+FORECAST_MODES = {
+    'prophet': "Prophet",
+    'ridge': "Ridge regression (fastest)"
+}
+
+# Fidelity profiles offered in the sidebar; the nightly batch uses "accurate"
+FORECAST_PROFILES = {
+    'fast': "Fast",
+    'balanced': "Balanced",
+    'accurate': "Accurate"
+}
+DEFAULT_FORECAST_PROFILE = 'balanced'
+
+# History shown in the forecast chart, in months (None: the latest year, 0: everything)
+CHART_WINDOWS = {
+    "Current year": None,
+    "Last 12 months": 12,
+    "Last 24 months": 24,
+    "All history": 0
+}
+
+FORECAST_PERIOD = 45
+# How long a rerun waits for a fit before rendering a stale forecast instead
+FORECAST_WAIT_SECONDS = 0.5
 
 class Dashboard:
-    def __init__(self):
+    def __init__(self, artifacts_only=False, artifacts_dir=ARTIFACTS_DIR):
         # Set page config with Otto Dörner branding
         st.set_page_config(
             # page_title="Otto Dörner Data Analysis",
@@ -115,30 +157,104 @@ class Dashboard:
         # Initialize data processor
         self.data_processor = DataProcessor()
         
+        # In artifacts-only mode forecasts come from batch_trainer.py and nothing is fitted
+        self.artifacts_only = artifacts_only
+        self.artifacts_dir = artifacts_dir
+        
+        # Background fit the page is waiting for, if any
+        self.pending_job = None
+        self.refresh_status = None
+        
     def display_header(self):
         """Display the header with logo and title"""
         display_header()
     
-    def display_dashboard(self, df):
-        """Display the main dashboard content"""
-        # Filter data 
-        df_filtered = self.data_processor.filter_data()
+    def select_backend(self):
+        """Sidebar choice between the accurate Prophet model and the fast ridge model"""
+        labels = {label: backend for backend, label in FORECAST_MODES.items()}
+        return labels[st.sidebar.radio("Forecast model", list(labels))]
+    
+    def select_profile(self):
+        """Sidebar choice of the forecast fidelity profile"""
+        labels = {label: profile for profile, label in FORECAST_PROFILES.items()}
+        index = list(FORECAST_PROFILES).index(DEFAULT_FORECAST_PROFILE)
+        return labels[st.sidebar.radio("Forecast fidelity", list(labels), index=index,
+                                       help="Fast answers in under a second; Accurate matches the nightly batch")]
+    
+    def request_forecast(self, forecaster, train_df):
+        """Forecast for the selection, fitted in the background pool
         
-        group_type_to_filter = ['S','W', 'T']
-        df_filtered = df_filtered.query("order_type in @group_type_to_filter")
+        Returns (forecaster, forecast, refreshing). When the fit is not ready within
+        FORECAST_WAIT_SECONDS, forecast is the segment's last stored forecast (or None)
+        and the page reruns once the job finishes.
+        """
+        key = (model_store.make_key(forecaster.segment, train_df, forecaster.holiday_df, forecaster.params),
+               forecaster.profile, FORECAST_PERIOD)
+        future = forecast_jobs.submit(st.session_state['session_id'], key, fit_forecast,
+                                      forecaster, train_df, FORECAST_PERIOD)
+        try:
+            fitted = future.result(timeout=FORECAST_WAIT_SECONDS)
+            return fitted, fitted.forecast, False
+        except FutureTimeoutError:
+            pass
         
-        # Add morning/afternoon label
-        df_filtered = self.data_processor.add_time_of_day(df_filtered)
+        self.pending_job = future
+        stale = model_store.latest_forecast(forecaster.segment, forecaster.params, forecast_name(FORECAST_PERIOD, uncertainty_samples=forecaster.uncertainty_samples))
+        return forecaster, stale, True
+    
+    def request_hierarchy(self, backend, profile, order_types):
+        """Reconciled forecasts of every selection, fitted once in the background pool
         
-        # Create separate dataframes for morning and afternoon deliveries
-        df_morning, df_afternoon = self.data_processor.get_morning_afternoon_data(df_filtered)
+        Returns None while the fit is running; the page reruns once it finishes.
+        """
+        key = ('hierarchy', self.data_processor.fingerprint, backend, profile, tuple(order_types), FORECAST_PERIOD)
+        hierarchy = HierarchicalForecaster(self.data_processor, store=model_store, backend=backend,
+                                           profile=profile, order_types=order_types)
+        future = forecast_jobs.submit(st.session_state['session_id'], key, hierarchy.fit, FORECAST_PERIOD)
+        try:
+            return future.result(timeout=FORECAST_WAIT_SECONDS)
+        except FutureTimeoutError:
+            self.pending_job = future
+            return None
+    
+    def wait_for_forecast(self, poll_seconds=0.5):
+        """Rerun the page once the pending fit finishes
         
-        # Get holiday data
-        holiday_df = self.data_processor.get_holiday_data()
+        The status is updated while waiting, which lets Streamlit stop this run as soon
+        as the user changes the selection; the new run then cancels the superseded job.
+        """
+        future = self.pending_job
+        start = time.time()
+        while not future.done():
+            time.sleep(poll_seconds)
+            if self.refresh_status is not None:
+                self.refresh_status.info(f"Refreshing forecast ({time.time() - start:.0f}s)...")
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self.refresh_status.error(f"Error fitting forecast: {str(future.exception())}")
+            return
+        st.rerun()
+    
+    def chart_window_start(self, train_df, val_df):
+        """First day of history to chart, from the sidebar choice"""
+        months = CHART_WINDOWS[st.sidebar.selectbox("Chart history", list(CHART_WINDOWS))]
+        if months is None:
+            return None
+        if months == 0:
+            return train_df['ds'].min()
+        last_date = max(train_df['ds'].max(), val_df['ds'].max())
+        return last_date - pd.DateOffset(months=months)
+    
+    def display_dashboard(self, df):
+        """Display the main dashboard content"""
+        # Morning deliveries for the order types we forecast
+        group_type_to_filter = ['S','W', 'T']
         
-        # Get unique values for dropdowns
-        container_types = df_morning['container_type'].unique().tolist()
-        hub_locations = df_morning['hub_location'].unique().tolist()
+        # Get unique values for dropdowns from the demand cube's dimension dictionaries
+        with span('dropdowns'):
+            container_types = self.data_processor.get_dimension_values('container_type', order_types=group_type_to_filter)
+            hub_locations = self.data_processor.get_dimension_values('hub_location', order_types=group_type_to_filter)
         
         # Add "All" option to the beginning of the lists
         container_types = ["All"] + container_types
@@ -152,26 +268,62 @@ class Dashboard:
         with col2:
             selected_hub = st.selectbox("Select Hub Location", hub_locations)
 
-        # Filter data based on selections
-        filtered_df = df_morning.copy()
-        
-        # Apply container type filter if not "All"
-        if selected_container != "All":
-            filtered_df = filtered_df[filtered_df['container_type'] == selected_container]
-            
-        # Apply hub location filter if not "All"
-        if selected_hub != "All":
-            filtered_df = filtered_df[filtered_df['hub_location'] == selected_hub]
+        # Filter data based on selections ("All" means no filter)
+        with span('filter'):
+            daily_counts = self.data_processor.get_daily_counts(
+                order_types=group_type_to_filter,
+                container_type=None if selected_container == "All" else selected_container,
+                hub=None if selected_hub == "All" else selected_hub
+            )
 
-        # Prepare filtered data for forecasting
-        train_df, val_df = self.data_processor.prepare_forecast_data(filtered_df)
+        if self.artifacts_only:
+            # Serve the pre-fitted forecast for this selection
+            with span('forecast.artifact') as s:
+                artifact = load_artifact(selected_container, selected_hub, self.artifacts_dir)
+                s['cache_hit'] = artifact is not None
+            if artifact is None:
+                st.warning("No pre-computed forecast for this selection. Run batch_trainer.py to create it.")
+                return
+            train_df, val_df, forecast, _ = artifact
+            forecaster = None
+        elif st.sidebar.checkbox("Reconcile across selections", value=False,
+                                 help="Fit every container type and hub once so that the totals add up"):
+            # Serve the selection from the reconciled forecasts of all selections
+            with span('forecast.hierarchy') as s:
+                hierarchy = self.request_hierarchy(self.select_backend(), self.select_profile(),
+                                                   group_type_to_filter)
+                s['cache_hit'] = hierarchy is not None
+            self.refresh_status = st.empty()
+            if hierarchy is None:
+                self.refresh_status.info("Fitting the forecasts of all selections. They will appear here when they are ready.")
+                return
+            train_df, val_df, forecast = hierarchy.forecast(selected_container, selected_hub)
+            forecaster = None
+        else:
+            # Get holiday data
+            with span('holidays'):
+                holiday_df = self.data_processor.get_holiday_data(hub=selected_hub)
+            
+            # Prepare filtered data for forecasting
+            with span('prepare_forecast_data'):
+                train_df, val_df = self.data_processor.prepare_forecast_data(daily_counts)
 
-        # Create and fit Prophet model
-        forecaster = Forecaster(holiday_df=holiday_df)
-        model = forecaster.create_model(train_df)
+            # Create and fit the model in the background (reused from the model store when nothing changed)
+            # New data warm-starts from the previous fit for this selection
+            forecaster = Forecaster(holiday_df=holiday_df, store=model_store,
+                                    segment=(selected_container, selected_hub), warm_start=True,
+                                    backend=self.select_backend(), profile=self.select_profile())
+            with span('forecast.request') as s:
+                forecaster, forecast, refreshing = self.request_forecast(forecaster, train_df)
+                s['cache_hit'] = not refreshing
 
-        # Make forecast
-        forecast = forecaster.make_forecast(train_df)
+            # Until the fit finishes, show the last forecast for this selection, if there is one
+            self.refresh_status = st.empty()
+            if forecast is None:
+                self.refresh_status.info("Fitting the forecast for this selection. It will appear here when it is ready.")
+                return
+            if refreshing:
+                self.refresh_status.info("Refreshing forecast. Showing the last forecast for this selection until the new one is ready.")
         
         # Display metrics above the chart
         col1, col2, col3 = st.columns(3)
@@ -184,8 +336,9 @@ class Dashboard:
                 
                 if not future_forecast.empty:
                     # Get first forecasted data point after validation
-                    first_forecast_date = future_forecast['ds'].min()
-                    containers_forecast = round(future_forecast[future_forecast['ds'] == first_forecast_date]['yhat'].values[0])
+                    next_day = next_day_forecast(forecast, val_df)
+                    first_forecast_date = next_day['ds']
+                    containers_forecast = round(next_day['yhat'])
                     forecast_date_str = first_forecast_date.strftime('%Y-%m-%d')
                     st.metric("Containers Needed Next Day", f"{containers_forecast}")
                     # st.markdown(f'<div style="font-size: 0.8rem; color: #888;">Forecast for {forecast_date_str}</div>', unsafe_allow_html=True)
@@ -197,11 +350,11 @@ class Dashboard:
                 st.metric("Containers Needed Next Day", "No validation data")
             
         with col2:
-            # Calculate trucks needed based on containers (assuming average of 3 containers per truck)
+            # Split the containers across vehicle groups and round each group's trucks up
+            fleet_profile = self.data_processor.get_fleet_profile(order_types=group_type_to_filter)
             if containers_forecast != "N/A":
-                # Assuming an average of 3 containers per truck
-                trucks_needed = int(np.ceil(containers_forecast / 4))
-                st.metric("Trucks Needed Next Day", f"{trucks_needed}")
+                trucks = fleet_profile.trucks(containers_forecast, hub=selected_hub)
+                st.metric("Trucks Needed Next Day", f"{trucks}")
             else:
                 st.metric("Trucks Needed Next Day", "N/A")
             
@@ -210,26 +363,19 @@ class Dashboard:
             pass
 
         # Get model components for explanation
+        params = forecaster.params if forecaster is not None else DEFAULT_PARAMS
         model_details = {
-            "changepoint_prior_scale": forecaster.model.changepoint_prior_scale,
-            "seasonality_prior_scale": forecaster.model.seasonality_prior_scale,
-            "seasonality_mode": forecaster.model.seasonality_mode
+            "changepoint_prior_scale": params.get('changepoint_prior_scale'),
+            "seasonality_prior_scale": params.get('seasonality_prior_scale'),
+            "seasonality_mode": params.get('seasonality_mode', 'additive')
         }
         
-        # Get forecast components if available
+        # Components come with the forecast, so no second prediction is needed
         forecast_components = None
         if not val_df.empty and 'ds' in forecast.columns:
             if not future_forecast.empty:
                 forecast_date = first_forecast_date
                 forecast_components = forecast[forecast['ds'] == forecast_date]
-                
-                # Request component-wise forecast to see all seasonality effects
-                if hasattr(forecaster.model, 'component_modes'):
-                    # Prophet version 1.0 and above
-                    forecast_with_components = forecaster.model.predict(pd.DataFrame({'ds': [forecast_date]}))
-                else:
-                    # Legacy Prophet
-                    forecast_with_components = forecast_components.copy()
         
         # Add explanation about the forecast with actual numbers
         # st.markdown(f"""
@@ -297,20 +443,22 @@ class Dashboard:
             - **Seasonal demand**: {'+' if yearly_rounded >= 0 else ''}{round(yearly_rounded)} containers
             - **Holiday impact**: {'+' if holidays_effect_rounded >= 0 else ''}{round(holidays_effect_rounded)} containers
             
-            This means you'll need **{trucks_needed} trucks**. 
+            This means you'll need **{trucks} trucks**. 
             """
             if weekly_rounded > 0:
                 markdown_text += f"The {day_of_week} effect shows that deliveries are typically {'higher' if weekly_rounded > 0 else 'lower'} on this day of the week."
             st.markdown(markdown_text)
             
         else:
-            st.markdown("""
+            capacities = ", ".join(f"{group}: {capacity} containers" for group, capacity in fleet_profile.capacities().items())
+            st.markdown(f"""
             The forecast considers:
             - Which day of the week it is (some days have more deliveries)
             - Time of year (seasonal patterns in container usage)
             - Holidays (which can reduce or increase demand)
             
-            Each truck can carry up to 4 containers, and we always round up to ensure you have enough trucks.
+            Trucks are planned per vehicle group: each group's capacity ({capacities}) comes from
+            the containers its vehicles delivered per day, and we always round up to ensure you have enough trucks.
             """)
 
         # Create visualization title based on selections
@@ -324,8 +472,12 @@ class Dashboard:
             title = f"Forecast for {selected_container} at {selected_hub}"
             
         # Create visualization
-        fig = create_forecast_chart(train_df, val_df, forecast, title)
-        st.plotly_chart(fig, use_container_width=True)
+        window_start = self.chart_window_start(train_df, val_df)
+        with span('chart.build'):
+            # Long windows switch to downsampled WebGL traces
+            fig = create_forecast_chart(train_df, val_df, forecast, title, window_start=window_start, mode='auto')
+        with span('chart.render'):
+            st.plotly_chart(fig, use_container_width=True)
     
     def display_footer(self):
         """Display the footer"""
@@ -333,11 +485,32 @@ class Dashboard:
     
     def run(self):
         """Run the dashboard"""
+        # One trace per rerun; stage timings are appended to the timings log
+        if 'session_id' not in st.session_state:
+            st.session_state['session_id'] = uuid.uuid4().hex
+        show_diagnostics = st.sidebar.checkbox("Show diagnostics", value=False)
+        
+        with start_trace('dashboard', session_id=st.session_state['session_id']) as trace:
+            with span('rerun'):
+                self.render()
+        
+        trace.write_jsonl()
+        if show_diagnostics:
+            display_diagnostics(trace)
+        
+        # Swap in the new forecast as soon as its background fit is done
+        if self.pending_job is not None:
+            self.wait_for_forecast()
+    
+    def render(self):
+        """Render the header, dashboard content and footer"""
         # Display header first to ensure logo appears at the top
-        self.display_header()
+        with span('header'):
+            self.display_header()
         
         # Load data
-        df = self.data_processor.load_data()
+        with span('load_data'):
+            df = self.data_processor.load_data(columns=DASHBOARD_COLUMNS)
         if df is None:
             st.error("Error loading data. Please check the data file.")
             return
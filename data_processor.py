@@ -1,72 +1,638 @@
+import os
+import json
+import hashlib
+import weakref
 import pandas as pd
 import numpy as np
 from datetime import datetime
-import holidays
+
+from frame_cache import frame_cache
+from diagnostics import span
+from demand_cube import DemandCube, CUBE_DIMENSIONS, CUBE_MEASURES
+from row_index import RowIndex
+from fleet_planner import FleetProfile, FLEET_COLUMNS
+from calendar_store import calendar_store, hub_state
+from shared_dataset import shared_dataset, select_columns
+
+# Columnar cache of the renamed and typed frame, rebuilt when the CSV changes
+CACHE_DIR = 'data/cache'
+CACHE_VERSION = 4
+
+# Attach to the memory-mapped dataset shared by all sessions and processes; 0 reads a private copy
+SHARED_DATASET = os.environ.get('SHARED_DATASET', '1') != '0'
+
+# Days after the latest delivery covered by the holiday table, the longest forecast horizon served
+HOLIDAY_HORIZON_DAYS = 365
+
+# First day of the forecasting training window
+TRAINING_START = '2021-01-04'
+
+# Either the combined CSV or the partitioned dataset written by ingest.py
+DEFAULT_DATA_PATH = os.environ.get('DATA_PATH', 'data/combined.csv')
+
+# Raw export column names and their readable names
+COLUMN_MAPPING = {
+    'LiefZeitV': 'earliest_delivery_time',
+    'LiefZeitB': 'latest_delivery_time',
+    'LiefKWJ': 'delivery_year',
+    'Monat': 'delivery_month',
+    'LiefDatum': 'delivery_date',
+    'CVgId': 'order_id',
+    'Typ': 'customer_type',
+    'LoAdrId': 'customer_site_id',
+    'LoPlz': 'customer_zipcode',
+    'LoOrt': 'customer_city',
+    'DspGrpKz': 'vehicle_group',
+    'DspZenKz': 'hub_location',
+    'AArtKz': 'order_type',
+    'ConTyp': 'container_type',
+    'CSAnz': 'containers_delivered',
+    'CHAnz': 'containers_picked_up',
+    'FzgNr': 'vehicle_id',
+    'Bez': 'waste_type',
+    'Plz': 'disposal_site_zipcode',
+    'Ort': 'disposal_site_city',
+    'AddDatum': 'order_datetime',
+    'EntPlz': 'destination_zipcode',
+    'EntOrt': 'destination_city'
+}
+
+# Declared dtypes of the loaded frame: repetitive strings become categories, ids and
+# counts are downcast and delivery times are stored as minutes after midnight
+CATEGORY_COLUMNS = [
+    'customer_type',
+    'customer_city',
+    'vehicle_group',
+    'hub_location',
+    'order_type',
+    'container_type',
+    'vehicle_id',
+    'waste_type',
+    'disposal_site_city',
+    'destination_city'
+]
+ZIPCODE_COLUMNS = ['customer_zipcode', 'disposal_site_zipcode', 'destination_zipcode']
+INTEGER_COLUMNS = [
+    'delivery_year',
+    'delivery_month',
+    'order_id',
+    'customer_site_id',
+    'containers_delivered',
+    'containers_picked_up'
+]
+TIME_COLUMNS = ['earliest_delivery_time', 'latest_delivery_time']
+
+# Explicit formats seen in the exports, tried in order
+DELIVERY_DATE_FORMATS = ['%Y-%m-%d', '%d.%m.%Y', '%d-%m-%Y']
+ORDER_DATETIME_FORMATS = ['%Y-%m-%d %H:%M:%S', '%d.%m.%Y %H:%M:%S', '%d.%m.%Y %H:%M', '%Y-%m-%d']
+
+def parse_dates(values, formats, length=None):
+    """Parse a string column with a list of explicit formats, filling gaps format by format"""
+    values = values.astype(str)
+    if length is not None:
+        # Drop trailing time parts such as " 00:00:00"
+        values = values.str.slice(0, length)
+    parsed = pd.to_datetime(values, format=formats[0], errors='coerce')
+    for fmt in formats[1:]:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(values[missing], format=fmt, errors='coerce')
+    return parsed
+
+def time_to_minutes(values):
+    """Minutes after midnight from HH:MM[:SS] strings, as small nullable integers"""
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype('Int16')
+    parts = values.astype(str).str.extract(r'(\d{1,2}):(\d{2})(?::\d{2})?\s*$')
+    minutes = pd.to_numeric(parts[0], errors='coerce') * 60 + pd.to_numeric(parts[1], errors='coerce')
+    return minutes.astype('Int16')
+
+def minutes_to_time(minutes):
+    """HH:MM:SS strings from minutes after midnight"""
+    minutes = minutes.astype('Float64')
+    text = (minutes // 60).astype('Int64').astype(str).str.zfill(2) + ':' + (minutes % 60).astype('Int64').astype(str).str.zfill(2) + ':00'
+    return text.where(minutes.notna(), None).astype(object)
+
+def downcast_integer(values):
+    """Smallest integer dtype that holds the values, nullable if any are missing"""
+    numeric = pd.to_numeric(values, errors='coerce')
+    present = numeric.dropna()
+    if len(present) and not (present == present.round()).all():
+        return numeric.astype('float32')
+    dtype = pd.to_numeric(present.astype('int64'), downcast='integer').dtype if len(present) else np.dtype('int8')
+    if numeric.isna().any():
+        return numeric.astype(dtype.name.capitalize())
+    return numeric.astype(dtype)
+
+def normalize_zipcodes(values):
+    """Zipcodes as strings, whether they were read as numbers (22525.0) or text"""
+    text = values.astype(object).where(values.notna()).astype(str).str.replace(r'\.0$', '', regex=True)
+    return text.where(values.notna(), None)
+
+def apply_schema(df):
+    """Cast a renamed frame to the declared compact dtypes"""
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            # Mixed numbers and strings would make an unwritable category, so use text
+            values = df[col]
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.where(values.isna(), values.astype(str))
+            df[col] = values.astype('category')
+    for col in ZIPCODE_COLUMNS:
+        if col in df.columns:
+            df[col] = normalize_zipcodes(df[col]).astype('category')
+    for col in INTEGER_COLUMNS:
+        if col in df.columns:
+            df[col] = downcast_integer(df[col])
+    for col in TIME_COLUMNS:
+        if col in df.columns:
+            df[col] = time_to_minutes(df[col])
+    return df
+
+def concat_frames(frames):
+    """Concatenate typed frames, keeping category columns as categories over the union of their values"""
+    frames = [frame for frame in frames if frame is not None]
+    if len(frames) == 1:
+        return frames[0]
+    for col in frames[0].columns:
+        if isinstance(frames[0][col].dtype, pd.CategoricalDtype):
+            categories = pd.api.types.union_categoricals(
+                [frame[col].astype('category') for frame in frames], ignore_order=True
+            ).categories
+            for frame in frames:
+                frame[col] = frame[col].astype('category').cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+def default_dtype(values, col=None):
+    """A column as pandas would type it without the declared schema, for memory comparisons"""
+    if col in TIME_COLUMNS and pd.api.types.is_numeric_dtype(values):
+        return minutes_to_time(values)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.astype(object)
+    if pd.api.types.is_integer_dtype(values):
+        return values.astype('float64') if values.isna().any() else values.astype('int64')
+    if pd.api.types.is_float_dtype(values):
+        return values.astype('float64')
+    return values
+
+def time_of_day(latest_delivery_time):
+    """Morning/Afternoon bucket from the latest delivery time; missing times count as 14:00"""
+    if pd.api.types.is_numeric_dtype(latest_delivery_time):
+        hour = (latest_delivery_time.astype('Float64') // 60).astype(float).fillna(14)
+    else:
+        hour = pd.to_numeric(
+            latest_delivery_time.astype(str).str.extract(r'(\d{1,2}):\d{2}(?::\d{2})?\s*$', expand=False),
+            errors='coerce'
+        ).fillna(14)
+    labels = np.where(hour < 12, 'Morning', 'Afternoon')
+    return pd.Categorical(labels, categories=['Morning', 'Afternoon'])
 
 class DataProcessor:
-    def __init__(self, data_path='data/combined.csv'):
+    def __init__(self, data_path=DEFAULT_DATA_PATH, cache_dir=CACHE_DIR, shared=SHARED_DATASET):
         self.data_path = data_path
+        self.cache_dir = cache_dir
+        self.shared = shared
+        # Releases the lease on the shared dataset version this processor is attached to
+        self._lease = None
+        self._shared_frame = None
         self.df = None
+        self.fingerprint = None
+        self.source_id = None
+        self.loaded_version = None
+        # Appended delivery files stored next to the cache, oldest first
+        self.tails = []
+        
+    def load_data(self, columns=None):
+        """Load data from the columnar cache, rebuilding it from CSV if the source changed
         
-    def load_data(self):
-        """Load data from CSV file"""
+        Rows appended with append_rows are read from their tail files and added to the cache.
+        With shared set, the frame is a read-only view of the dataset version that every
+        session and process on the machine maps, and must not be modified.
+        """
         try:
-            # Read the CSV with low_memory=False to avoid mixed type warnings
-            self.df = pd.read_csv(self.data_path, low_memory=False)
-            # Rename columns to more readable format
-            column_mapping = {
-                'LiefZeitV': 'earliest_delivery_time',
-                'LiefZeitB': 'latest_delivery_time',
-                'LiefKWJ': 'delivery_year',
-                'Monat': 'delivery_month',
-                'LiefDatum': 'delivery_date',
-                'CVgId': 'order_id',
-                'Typ': 'customer_type',
-                'LoAdrId': 'customer_site_id',
-                'LoPlz': 'customer_zipcode',
-                'LoOrt': 'customer_city',
-                'DspGrpKz': 'vehicle_group',
-                'DspZenKz': 'hub_location',
-                'AArtKz': 'order_type',
-                'ConTyp': 'container_type',
-                'CSAnz': 'containers_delivered',
-                'CHAnz': 'containers_picked_up',
-                'FzgNr': 'vehicle_id',
-                'Bez': 'waste_type',
-                'Plz': 'disposal_site_zipcode',
-                'Ort': 'disposal_site_city',
-                'AddDatum': 'order_datetime',
-                'EntPlz': 'destination_zipcode',
-                'EntOrt': 'destination_city'
-            }
-            self.df = self.df.rename(columns=column_mapping)
-            # Convert delivery_date column to datetime
-            self.df['delivery_date'] = pd.to_datetime(self.df['delivery_date'])
+            with span('data.fingerprint'):
+                fingerprint = self._source_fingerprint()
+                self.tails = (self._read_manifest() or {}).get('tails', [])
+            with span('data.read') as s:
+                s['cache_hit'] = self._cache_is_valid(fingerprint)
+                df = None
+                if s['cache_hit'] and not self.shared:
+                    # Only read the columns the caller needs
+                    df = pd.read_parquet(self._cache_path(), columns=columns)
+                elif not s['cache_hit']:
+                    df = self._read_source()
+                    self._trim_tails(df)
+                    self._write_cache(df, fingerprint)
+                # Identifies this dataset version in the shared frame cache; validating or
+                # writing the cache has set the content hash, so touching the file keeps it
+                self.source_id = fingerprint.get('sha256') or f"{fingerprint['size']}-{fingerprint['mtime']}"
+                s['tails'] = len(self.tails)
+                s['shared'] = self.shared
+                if self.shared:
+                    self.df = self._attach_shared(df, columns)
+                else:
+                    if columns is not None and not s['cache_hit']:
+                        df = df[columns]
+                    self.df = concat_frames([df] + self._read_tails(columns)) if self.tails else df
+            
+            self.loaded_version = self._current_version(fingerprint)
+            self.fingerprint = (self._dataset_id(), tuple(columns) if columns is not None else None)
             return self.df
         except Exception as e:
             print(f"Error loading data: {str(e)}")
             return None
     
-    def filter_data(self, year=None, order_types=None):
-        """Filter data by year and order types"""
-        df_filtered = self.df.copy()
+    def _read_source(self):
+        """Read the raw CSV or partitioned dataset and return the renamed and typed frame"""
+        if os.path.isdir(self.data_path):
+            # Partition columns are derived from LiefDatum, so they don't need to be read back
+            df = pd.read_parquet(self.data_path, partitioning=None)
+        else:
+            # Read only the known columns, with the repetitive strings straight into categories
+            category_columns = [raw for raw, name in COLUMN_MAPPING.items() if name in CATEGORY_COLUMNS + ZIPCODE_COLUMNS]
+            df = pd.read_csv(
+                self.data_path,
+                usecols=lambda col: col in COLUMN_MAPPING,
+                dtype={col: 'category' for col in category_columns},
+                low_memory=False
+            )
+        return self.prepare_frame(df)
+    
+    def _current_version(self, fingerprint=None):
+        """Size and mtime of the source and the last appended tail, cheap to check"""
+        fingerprint = fingerprint or self._source_fingerprint()
+        tails = (self._read_manifest() or {}).get('tails', [])
+        return (fingerprint['size'], fingerprint['mtime'], tails[-1]['seq'] if tails else 0)
+    
+    def has_new_data(self):
+        """Whether the source changed or rows were appended since load_data"""
+        return self.loaded_version is not None and self._current_version() != self.loaded_version
+    
+    def _attach_shared(self, df=None, columns=None):
+        """Columns of the shared frame of the current version, publishing it if no process has yet
         
-        if year:
-            df_filtered = df_filtered[df_filtered['delivery_date'].dt.year == year]
-            
-        if order_types:
-            df_filtered = df_filtered[df_filtered['order_type'].isin(order_types)]
-            
-        return df_filtered
+        df is the freshly rebuilt frame, if any; otherwise the published frame is built from
+        the cache and tails. The lease on the previously attached version is released.
+        """
+        prefix = self._shared_prefix()
+        version = self._version_tag()
+        
+        def build():
+            frame = df if df is not None else pd.read_parquet(self._cache_path())
+            return concat_frames([frame] + self._read_tails()) if self.tails else frame
+        
+        full = shared_dataset.acquire(prefix, version, build)
+        self._shared_frame = full
+        if self._lease is not None:
+            self._lease()
+        # Released when the next version is loaded or this processor is garbage collected
+        self._lease = weakref.finalize(self, shared_dataset.release, prefix, version)
+        return full if columns is None else select_columns(full, columns)
     
-    def add_time_of_day(self, df=None):
-        """Add time of day label (Morning/Afternoon) to the dataframe"""
+    def _shared_prefix(self):
+        return os.path.splitext(self._cache_path())[0] + '.shared'
+    
+    def shared_path(self):
+        """Path of the shared dataset file of the loaded version"""
+        return shared_dataset.path(self._shared_prefix(), self._version_tag())
+    
+    def _version_tag(self):
+        """Short form of the dataset version used in cache file names"""
+        return self.source_id[:16] + self._dataset_id()[len(self.source_id):]
+    
+    def _dataset_id(self):
+        """Version of the loaded dataset: the source plus the last appended tail"""
+        return f"{self.source_id}-t{self.tails[-1]['seq']}" if self.tails else self.source_id
+    
+    def _tail_path(self, seq):
+        return os.path.splitext(self._cache_path())[0] + f".tail-{seq:06d}.parquet"
+    
+    def _trim_tails(self, source_df):
+        """Drop the appended orders that a rebuilt source already contains"""
+        latest = source_df['delivery_date'].max()
+        tails = []
+        for tail in self.tails:
+            path = self._tail_path(tail['seq'])
+            if pd.Timestamp(tail['min_date']) > latest:
+                # Only days after the source, so none of its orders can be in it
+                tails.append(tail)
+                continue
+            rows = pd.read_parquet(path)
+            kept = rows[~rows['order_id'].isin(source_df['order_id'])]
+            if kept.empty:
+                os.remove(path)
+                continue
+            if len(kept) < len(rows):
+                kept.to_parquet(path + '.tmp', index=False)
+                os.replace(path + '.tmp', path)
+            tails.append(dict(
+                tail,
+                rows=len(kept),
+                min_date=kept['delivery_date'].min().strftime('%Y-%m-%d'),
+                max_date=kept['delivery_date'].max().strftime('%Y-%m-%d')
+            ))
+        self.tails = tails
+    
+    def _read_tails(self, columns=None):
+        return [pd.read_parquet(self._tail_path(tail['seq']), columns=columns) for tail in self.tails]
+    
+    def _read_cached(self, columns):
+        """Columns of the cached dataset including the appended tails, for columns the loaded frame lacks"""
+        if self._shared_frame is not None:
+            return select_columns(self._shared_frame, columns)
+        return concat_frames([pd.read_parquet(self._cache_path(), columns=columns)] + self._read_tails(columns))
+    
+    def prepare_frame(self, df):
+        """Rename raw export columns, add the derived columns and apply the compact schema"""
+        df = df.rename(columns=COLUMN_MAPPING)
+        df = self.add_derived_columns(df)
+        df = apply_schema(df)
+        
+        # Mixed-type object columns (e.g. zipcodes read as both int and str) can't be
+        # stored in a columnar file, so keep them as strings
+        for col in df.select_dtypes(include='object').columns:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+        return df
+    
+    def append_rows(self, raw_df):
+        """Append new order rows, in the raw export columns, without rereading the dataset
+        
+        Only the new rows are parsed and typed. They are written as a tail file next to
+        the cache, and their daily totals are added to the stored demand cube. Orders
+        already in the dataset are skipped. Returns the appended typed rows.
+        
+        Each append is a new dataset version, and with the shared dataset the first load
+        of a version writes the whole Arrow file again, so append rows in batches.
+        """
+        if self.load_data(columns=['order_id']) is None:
+            raise RuntimeError(f"Could not load data from {self.data_path}")
+        previous_cube = self._cube_path()
+        
+        df = self.prepare_frame(raw_df[[col for col in COLUMN_MAPPING if col in raw_df.columns]].copy())
+        df = df[~df['order_id'].isin(self.df['order_id'])].drop_duplicates('order_id')
+        if df.empty:
+            return df
+        
+        seq = self.tails[-1]['seq'] + 1 if self.tails else 1
+        path = self._tail_path(seq)
+        df.to_parquet(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+        self.tails.append({
+            'seq': seq,
+            'rows': len(df),
+            'min_date': df['delivery_date'].min().strftime('%Y-%m-%d'),
+            'max_date': df['delivery_date'].max().strftime('%Y-%m-%d')
+        })
+        manifest = self._read_manifest()
+        self._write_manifest(manifest)
+        self.fingerprint = (self._dataset_id(), self.fingerprint[1])
+        self.loaded_version = self._current_version()
+        
+        # Add the new rows' daily totals to the stored cube instead of rebuilding it
+        if os.path.exists(previous_cube):
+            with span('cube.append'):
+                cube = DemandCube.load(previous_cube).append(DemandCube.from_frame(df))
+            self._save_cube(cube, self._cube_path())
+        return df
+    
+    def _cache_path(self):
+        """Path of the columnar cache file for the current data source"""
+        name = os.path.splitext(os.path.basename(self.data_path))[0]
+        return os.path.join(self.cache_dir, f"{name}.parquet")
+    
+    def _manifest_path(self):
+        """Path of the manifest describing which source the cache was built from"""
+        return os.path.splitext(self._cache_path())[0] + '.manifest.json'
+    
+    def _source_files(self):
+        """Files making up the data source, in a stable order"""
+        if not os.path.isdir(self.data_path):
+            return [self.data_path]
+        files = []
+        for root, _, names in os.walk(self.data_path):
+            files.extend(os.path.join(root, name) for name in names if name.endswith('.parquet'))
+        return sorted(files)
+    
+    def _source_fingerprint(self, with_hash=False):
+        """Size and mtime of the source file(s), plus the content hash if requested"""
+        files = self._source_files()
+        stats = [os.stat(path) for path in files]
+        fingerprint = {
+            'version': CACHE_VERSION,
+            'source': os.path.abspath(self.data_path),
+            'size': sum(stat.st_size for stat in stats),
+            'mtime': max((stat.st_mtime_ns for stat in stats), default=0)
+        }
+        if with_hash:
+            sha = hashlib.sha256()
+            for path in files:
+                sha.update(os.path.relpath(path, self.data_path).encode())
+                with open(path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b''):
+                        sha.update(chunk)
+            fingerprint['sha256'] = sha.hexdigest()
+        return fingerprint
+    
+    def memory_report(self, df=None):
+        """Per-column bytes of the loaded frame with the default pandas dtypes and with the declared schema"""
         if df is None:
             df = self.df
-            
-        df['time_of_day'] = df['latest_delivery_time'].fillna('14:00').apply(
-            lambda x: 'Morning' if int(str(x).split(':')[0]) < 12 else 'Afternoon'
+        rows = []
+        for col in df.columns:
+            rows.append({
+                'column': col,
+                'dtype': str(df[col].dtype),
+                'default_bytes': int(default_dtype(df[col], col).memory_usage(deep=True, index=False)),
+                'bytes': int(df[col].memory_usage(deep=True, index=False))
+            })
+        report = pd.DataFrame(rows).set_index('column')
+        report.loc['total'] = ['', report['default_bytes'].sum(), report['bytes'].sum()]
+        report['saved_pct'] = (100 * (1 - report['bytes'] / report['default_bytes'])).round(1)
+        return report
+    
+    def _read_manifest(self):
+        """Return the stored manifest, or None if there is no usable cache"""
+        if not (os.path.exists(self._cache_path()) and os.path.exists(self._manifest_path())):
+            return None
+        try:
+            with open(self._manifest_path()) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def _cache_is_valid(self, fingerprint):
+        """Check the cache against the source, hashing only when size or mtime changed"""
+        manifest = self._read_manifest()
+        if manifest is None or manifest.get('version') != CACHE_VERSION:
+            return False
+        if manifest.get('source') != fingerprint['source']:
+            return False
+        if manifest['size'] == fingerprint['size'] and manifest['mtime'] == fingerprint['mtime']:
+            fingerprint['sha256'] = manifest.get('sha256')
+            return True
+        
+        # The file was touched; it is only stale if the content actually differs
+        if manifest['size'] != fingerprint['size']:
+            return False
+        fingerprint.update(self._source_fingerprint(with_hash=True))
+        if manifest.get('sha256') != fingerprint['sha256']:
+            return False
+        self._write_manifest(fingerprint)
+        return True
+    
+    def _write_manifest(self, fingerprint):
+        """Store the source fingerprint and the appended tails next to the cache file"""
+        path = self._manifest_path()
+        with open(path + '.tmp', 'w') as f:
+            json.dump(dict(fingerprint, tails=self.tails), f)
+        os.replace(path + '.tmp', path)
+    
+    def _write_cache(self, df, fingerprint):
+        """Write the frame to the columnar cache; failures only cost the next load"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            if 'sha256' not in fingerprint:
+                fingerprint.update(self._source_fingerprint(with_hash=True))
+            tmp_path = self._cache_path() + '.tmp'
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, self._cache_path())
+            self._write_manifest(fingerprint)
+        except Exception as e:
+            print(f"Could not write data cache: {str(e)}")
+    
+    def filter_data(self, year=None, order_types=None, columns=None):
+        """Filter data by year and order types
+        
+        With no filters the loaded frame itself is returned, so callers must not modify it in place.
+        """
+        positions = self.select_rows(year=year or None, order_types=order_types or None)
+        return self.take_rows(positions, columns)
+    
+    def get_row_index(self):
+        """Row positions grouped by order type, year, time of day, container type and hub, built once per dataset"""
+        if self.fingerprint is None:
+            return RowIndex.from_frame(self.df)
+        return frame_cache.get_or_compute(('row_index', self.fingerprint), lambda: RowIndex.from_frame(self.df))
+    
+    def select_rows(self, year=None, order_types=None, time_of_day=None, container_type=None, hub=None):
+        """Positions of the rows in a selection, or None for all rows; None means no filter"""
+        return self.get_row_index().select(
+            year=year,
+            order_type=order_types,
+            time_of_day=time_of_day,
+            container_type=container_type,
+            hub_location=hub
+        )
+    
+    def take_rows(self, positions, columns=None):
+        """Materialize only the selected rows and columns of the loaded frame"""
+        if positions is None:
+            return self.df if columns is None else self.df[columns]
+        if columns is None:
+            return self.df.iloc[positions]
+        return self.df.iloc[positions, self.df.columns.get_indexer(columns)]
+    
+    def get_filtered_data(self, year=None, order_types=None, container_type=None, hub=None, columns=None):
+        """Morning deliveries for a selection
+        
+        Only the row positions are memoized across sessions in the shared frame cache;
+        each call materializes just the selected rows.
+        """
+        order_types = tuple(sorted(order_types)) if order_types else None
+        key = ('rows', self.fingerprint, year, order_types, container_type, hub)
+        positions = frame_cache.get_or_compute(key, lambda: self.select_rows(
+            year=year or None,
+            order_types=order_types,
+            time_of_day='Morning',
+            container_type=container_type,
+            hub=hub
+        ))
+        return self.take_rows(positions, columns)
+    
+    def get_demand_cube(self):
+        """Daily demand cube for the loaded dataset, read from disk or built once and shared"""
+        return frame_cache.get_or_compute(('demand_cube', self.fingerprint[0]), self._load_or_build_cube)
+    
+    def get_fleet_profile(self, order_types=None, time_of_day='Morning'):
+        """Vehicle group capacities, demand shares and fleet sizes for a selection, built once per dataset"""
+        order_types = tuple(sorted(order_types)) if order_types else None
+        key = ('fleet_profile', self.fingerprint[0], order_types, time_of_day)
+        return frame_cache.get_or_compute(key, lambda: self._build_fleet_profile(order_types, time_of_day))
+    
+    def _build_fleet_profile(self, order_types, time_of_day):
+        df = self.df
+        if any(col not in df.columns for col in FLEET_COLUMNS):
+            df = self._read_cached(FLEET_COLUMNS)
+        with span('fleet.profile'):
+            return FleetProfile.from_frame(df, order_types=order_types, time_of_day=time_of_day)
+    
+    def get_daily_counts(self, order_types=None, container_type=None, hub=None, time_of_day='Morning'):
+        """Daily delivered containers for a selection, summed from the demand cube"""
+        return self.get_demand_cube().daily(
+            time_of_day=time_of_day,
+            order_type=order_types,
+            container_type=container_type,
+            hub_location=hub
         )
+    
+    def get_dimension_values(self, dim, order_types=None, time_of_day='Morning'):
+        """Values of container_type or hub_location that occur in the selection, for dropdowns"""
+        return self.get_demand_cube().dimension_values(dim, time_of_day=time_of_day, order_type=order_types)
+    
+    def _cube_path(self):
+        return os.path.splitext(self._cache_path())[0] + f".cube.{self._version_tag()}.parquet"
+    
+    def _load_or_build_cube(self):
+        path = self._cube_path()
+        if os.path.exists(path):
+            with span('cube.load'):
+                return DemandCube.load(path)
+        
+        needed = ['delivery_date'] + CUBE_DIMENSIONS + CUBE_MEASURES
+        df = self.df
+        if any(col not in df.columns for col in needed):
+            df = self._read_cached(needed)
+        with span('cube.build'):
+            cube = DemandCube.from_frame(df)
+        self._save_cube(cube, path)
+        return cube
+    
+    def _save_cube(self, cube, path):
+        try:
+            # Drop cubes built for older versions of the dataset
+            prefix = os.path.splitext(self._cache_path())[0] + '.cube.'
+            for name in os.listdir(self.cache_dir):
+                old_path = os.path.join(self.cache_dir, name)
+                if old_path.startswith(prefix) and old_path != path:
+                    os.remove(old_path)
+            cube.save(path)
+        except Exception as e:
+            print(f"Could not write demand cube: {str(e)}")
+    
+    def add_derived_columns(self, df):
+        """Parse dates and add time of day, weekday, ISO week and lead time columns once at ingest"""
+        df['delivery_date'] = parse_dates(df['delivery_date'], DELIVERY_DATE_FORMATS, length=10)
+        df['order_datetime'] = parse_dates(
+            df['order_datetime'].astype(str).str.strip("[]").str.replace(r"[',]", '', regex=True),
+            ORDER_DATETIME_FORMATS
+        )
+        df['time_of_day'] = time_of_day(df['latest_delivery_time'])
+        df['weekday'] = df['delivery_date'].dt.dayofweek.astype('Int8')
+        df['iso_week'] = df['delivery_date'].dt.isocalendar().week.astype('Int8')
+        # Days between the order being placed and the delivery date
+        df['lead_time_days'] = (
+            (df['delivery_date'] - df['order_datetime']) / pd.Timedelta(days=1)
+        ).astype('float32')
+        return df
+    
+    def add_time_of_day(self, df=None):
+        """Add time of day label (Morning/Afternoon) to the dataframe, reusing the ingest column"""
+        if df is None:
+            df = self.df
+        
+        if 'time_of_day' not in df.columns:
+            df['time_of_day'] = time_of_day(df['latest_delivery_time'])
         return df
     
     def get_morning_afternoon_data(self, df=None):
@@ -74,39 +640,57 @@ class DataProcessor:
         if df is None:
             df = self.df
             
+        if df is self.df and 'time_of_day' in df.columns:
+            # Whole dataset: take the precomputed time of day groups instead of scanning it
+            df_morning = self.take_rows(self.select_rows(time_of_day='Morning'))
+            df_afternoon = self.take_rows(self.select_rows(time_of_day='Afternoon'))
+            return df_morning, df_afternoon
+        
         df = self.add_time_of_day(df)
         df_morning = df[df['time_of_day'] == 'Morning']
         df_afternoon = df[df['time_of_day'] == 'Afternoon']
         
         return df_morning, df_afternoon
     
-    def get_holiday_data(self, years=None):
-        """Get holiday data for forecasting"""
-        if years is None:
-            years = list(range(2020, 2026))
-            
-        de_holidays = holidays.Germany(years=years)
+    def get_holiday_data(self, years=None, hub=None):
+        """Get holiday data for forecasting
         
-        # Convert to Prophet holiday format
-        holiday_df = pd.DataFrame([
-            {'ds': date, 'holiday': name, 'lower_window': 0, 'upper_window': 0}
-            for date, name in de_holidays.items()
-        ])
+        Holidays and bridge days of the hub's federal state come from the shared calendar
+        store; without a hub (or for "All") the national holidays are used. By default the
+        years run from the first delivery to HOLIDAY_HORIZON_DAYS after the latest one.
+        """
+        if years is None:
+            dates = self.get_demand_cube().cube['delivery_date']
+            end = dates.max() + pd.Timedelta(days=HOLIDAY_HORIZON_DAYS)
+            years = [dates.min().year, end.year]
         
-        # Add holiday effects
-        holiday_df['prior_scale'] = 10.0  # Stronger holiday effects
+        holiday_df = calendar_store.holidays(hub_state(hub), min(years), max(years))
         
-        return holiday_df
+        # The table is shared between sessions and Prophet modifies the one it is given
+        return holiday_df.copy()
     
-    def prepare_forecast_data(self, df_morning, forecast_period=45):
-        """Prepare data for Prophet forecasting"""
-        # Create a date range from Jan 4 to Mar 31
-        date_range = pd.date_range(start='2021-01-04', end='2025-03-31', freq='D')
+    def get_latest_date(self):
+        """Latest delivery date in the loaded dataset"""
+        if self.df is None or 'delivery_date' not in self.df.columns:
+            return None
+        return self.df['delivery_date'].max()
+    
+    def build_daily_series(self, df_morning, end_date=None):
+        """Daily ds/y series with every day from TRAINING_START to end_date, missing days as 0
         
+        df_morning may hold order rows or daily totals. end_date defaults to the latest
+        date in the dataset.
+        """
         # Group by delivery date and get counts
-        import streamlit as st        
         daily_counts = df_morning.groupby('delivery_date').containers_delivered.sum().reset_index()
         
+        # Extend the window to the newest data instead of a fixed end date
+        if end_date is None:
+            end_date = self.get_latest_date()
+        if end_date is None or pd.isna(end_date):
+            end_date = daily_counts['delivery_date'].max()
+        date_range = pd.date_range(start=TRAINING_START, end=end_date, freq='D')
+        
         # Create a DataFrame with all dates and merge with counts
         prophet_df = pd.DataFrame({'ds': date_range})
         prophet_df = prophet_df.merge(daily_counts[['delivery_date', 'containers_delivered']], 
@@ -117,6 +701,11 @@ class DataProcessor:
         # Fill missing values with 0 and clean up columns
         prophet_df['y'] = prophet_df['containers_delivered'].fillna(0)
         prophet_df = prophet_df[['ds', 'y']]  # Keep only required Prophet columns
+        return prophet_df
+    
+    def prepare_forecast_data(self, df_morning, forecast_period=45, end_date=None):
+        """Prepare data for Prophet forecasting"""
+        prophet_df = self.build_daily_series(df_morning, end_date=end_date)
         
         # Split data into training and validation sets (last 30 days for validation)
         cutoff_date = prophet_df['ds'].max() - pd.Timedelta(days=30)
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+# Grain of the cube besides delivery_date, and the measures summed at that grain
+CUBE_DIMENSIONS = ['time_of_day', 'order_type', 'container_type', 'hub_location']
+CUBE_MEASURES = ['containers_delivered', 'containers_picked_up']
+
+class DemandCube:
+    """Daily demand pre-aggregated at (delivery_date, time_of_day, order_type, container_type, hub_location)
+
+    Dimension columns are categoricals, so their categories act as the dimension
+    dictionaries and filters compare small integer codes.
+    """
+    def __init__(self, cube):
+        self.cube = cube
+        self.dimensions = {dim: cube[dim].cat.categories for dim in CUBE_DIMENSIONS}
+        self._codes = {dim: cube[dim].cat.codes.to_numpy() for dim in CUBE_DIMENSIONS}
+
+    @classmethod
+    def from_frame(cls, df):
+        """Aggregate order rows into the cube"""
+        keys = {'delivery_date': df['delivery_date']}
+        for dim in CUBE_DIMENSIONS:
+            keys[dim] = df[dim].astype('category')
+        grouped = pd.DataFrame(keys)
+        for measure in CUBE_MEASURES:
+            grouped[measure] = df[measure].fillna(0).to_numpy()
+        grouped['orders'] = 1
+
+        # Keep rows with missing dimension values so the "All" totals match the order rows
+        cube = grouped.groupby(['delivery_date'] + CUBE_DIMENSIONS, observed=True, sort=True, dropna=False).sum()
+        cube = cube[cube['orders'] > 0].reset_index()
+        for column in CUBE_MEASURES + ['orders']:
+            cube[column] = cube[column].astype('int32')
+        return cls(cube)
+
+    def append(self, other):
+        """Cube with the rows of another cube added; days present in both are summed"""
+        frames = [self.cube.copy(), other.cube.copy()]
+        for dim in CUBE_DIMENSIONS:
+            categories = self.dimensions[dim].union(other.dimensions[dim])
+            for frame in frames:
+                frame[dim] = frame[dim].cat.set_categories(categories)
+        cube = pd.concat(frames, ignore_index=True)
+
+        # Only late deliveries for days already in the cube need aggregating again
+        overlap = (cube['delivery_date'].isin(self.cube['delivery_date'])
+                   & cube['delivery_date'].isin(other.cube['delivery_date'])).to_numpy()
+        if overlap.any():
+            summed = cube[overlap].groupby(['delivery_date'] + CUBE_DIMENSIONS, observed=True, dropna=False).sum()
+            cube = pd.concat([cube[~overlap], summed.reset_index()], ignore_index=True)
+        cube = cube.sort_values('delivery_date', kind='stable').reset_index(drop=True)
+        for column in CUBE_MEASURES + ['orders']:
+            cube[column] = cube[column].astype('int32')
+        return DemandCube(cube)
+
+    @property
+    def nbytes(self):
+        # The dimension codes are views of the frame's categoricals
+        return int(self.cube.memory_usage(deep=True).sum())
+
+    @classmethod
+    def load(cls, path):
+        return cls(pd.read_parquet(path))
+
+    def save(self, path):
+        self.cube.to_parquet(path, index=False)
+
+    def _mask(self, **filters):
+        """Boolean mask over cube rows; a filter value of None means all members"""
+        mask = np.ones(len(self.cube), dtype=bool)
+        for dim, values in filters.items():
+            if values is None:
+                continue
+            if isinstance(values, str):
+                values = [values]
+            codes = self.dimensions[dim].get_indexer(list(values))
+            mask &= np.isin(self._codes[dim], codes[codes >= 0])
+        return mask
+
+    def daily(self, measure='containers_delivered', **filters):
+        """Daily totals of a measure for a filter combination, e.g. daily(hub_location='HH')"""
+        rows = self.cube[self._mask(**filters)]
+        return rows.groupby('delivery_date', sort=True)[measure].sum().reset_index()
+
+    def dimension_values(self, dim, **filters):
+        """Members of a dimension that occur under the given filters, for dropdowns"""
+        codes = np.unique(self._codes[dim][self._mask(**filters)])
+        return self.dimensions[dim][codes[codes >= 0]].tolist()
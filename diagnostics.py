@@ -0,0 +1,147 @@
+"""Lightweight timing spans for the dashboard pipeline.
+
+Wrap a stage in `with span('stage.name') as s:` and set flags such as
+`s['cache_hit'] = True` inside it. Spans are recorded into the active trace,
+one per dashboard rerun, which can be shown in the sidebar and appended to a
+JSON lines log. Summarize a log with:
+
+    python diagnostics.py logs/timings.jsonl
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import contextvars
+from contextlib import contextmanager
+
+TIMINGS_LOG = os.environ.get('DASHBOARD_TIMINGS_LOG', 'logs/timings.jsonl')
+
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+
+def _rss_bytes():
+    """Resident memory of this process, or None where it can't be read cheaply"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+class Trace:
+    def __init__(self, name, session_id=None):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.started = time.time()
+        self._clock = time.perf_counter()
+        self.spans = []
+        self._depth = 0
+
+    def as_records(self):
+        """Spans as flat dicts ready to be logged"""
+        return [
+            dict(trace_id=self.trace_id, trace=self.name, session_id=self.session_id,
+                 timestamp=self.started, **record)
+            for record in self.spans if record is not None
+        ]
+
+    def write_jsonl(self, path=TIMINGS_LOG):
+        """Append the spans to a JSON lines log"""
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with open(path, 'a') as f:
+                for record in self.as_records():
+                    f.write(json.dumps(record, default=str) + '\n')
+        except OSError as e:
+            print(f"Could not write timings: {str(e)}")
+
+@contextmanager
+def start_trace(name, session_id=None):
+    """Make a new trace active for the spans recorded inside the block"""
+    trace = Trace(name, session_id=session_id)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+@contextmanager
+def span(name, **attributes):
+    """Time a stage and record it, with its memory delta, in the active trace"""
+    trace = _current_trace.get()
+    record = dict(attributes)
+    if trace is None:
+        yield record
+        return
+
+    depth = trace._depth
+    trace._depth += 1
+    # Reserve the slot now so spans stay in the order their stages started
+    index = len(trace.spans)
+    trace.spans.append(None)
+    rss_before = _rss_bytes()
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        seconds = time.perf_counter() - start
+        rss_after = _rss_bytes()
+        trace._depth = depth
+        trace.spans[index] = dict(
+            name=name,
+            depth=depth,
+            offset=round(start - trace._clock, 6),
+            seconds=round(seconds, 6),
+            memory_delta_mb=None if rss_before is None or rss_after is None
+            else round((rss_after - rss_before) / 1024 / 1024, 2),
+            **record
+        )
+
+def display_diagnostics(trace):
+    """Show a trace's spans in the Streamlit sidebar"""
+    import pandas as pd
+    import streamlit as st
+
+    if trace is None or not trace.spans:
+        return
+    rows = []
+    for record in trace.spans:
+        if record is None:
+            continue
+        row = {
+            'stage': ' ' * record['depth'] + record['name'],
+            'ms': round(record['seconds'] * 1000, 1),
+            'mem Δ MB': record['memory_delta_mb'],
+            'cache hit': record.get('cache_hit')
+        }
+        rows.append(row)
+    with st.sidebar.expander("Diagnostics", expanded=True):
+        st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+
+def summarize(path=TIMINGS_LOG, percentiles=(50, 90, 99)):
+    """Latency percentiles per stage across every trace in a JSON lines log"""
+    import pandas as pd
+
+    records = pd.read_json(path, lines=True)
+    if records.empty:
+        return records
+    grouped = records.groupby('name')['seconds']
+    summary = grouped.agg(['count', 'mean'])
+    for p in percentiles:
+        summary[f"p{p}"] = grouped.quantile(p / 100)
+    if 'cache_hit' in records.columns:
+        summary['cache_hit_rate'] = records.groupby('name')['cache_hit'].mean()
+    return summary.sort_values('mean', ascending=False)
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize dashboard stage timings")
+    parser.add_argument('path', nargs='?', default=TIMINGS_LOG)
+    args = parser.parse_args()
+    if not os.path.exists(args.path):
+        print(f"No timings log at {args.path}")
+        sys.exit(1)
+    print(summarize(args.path).to_string(float_format=lambda v: f"{v:.4f}"))
+
+if __name__ == "__main__":
+    main()
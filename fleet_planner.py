@@ -0,0 +1,178 @@
+"""Truck requirements for every hub x day x vehicle group over the forecast horizon.
+
+Usage:
+    python fleet_planner.py --horizon 14 --output artifacts/fleet_plan.csv
+
+Capacities come from the history: a vehicle group's capacity is a high quantile of
+the containers its vehicles delivered per day. Daily demand per hub and vehicle group
+is forecast with the ridge backend, fitting every series of a federal state in one
+solve, and turned into trucks with array operations over the whole fleet at once.
+"""
+import argparse
+import numpy as np
+import pandas as pd
+
+from calendar_store import calendar_store, HUB_STATES
+from ridge_model import RidgeModel, RIDGE_PARAMS
+
+FLEET_COLUMNS = ['delivery_date', 'time_of_day', 'order_type', 'hub_location', 'vehicle_group',
+                 'vehicle_id', 'containers_delivered']
+# A vehicle's capacity is this quantile of its group's daily loads, so rare overloaded days don't set it
+CAPACITY_QUANTILE = 0.9
+# Containers per truck for a vehicle group without any loaded days
+DEFAULT_CAPACITY = 4
+FLEET_WINDOW_DAYS = 90  # Recent days used for fleet sizes and demand shares
+
+class FleetProfile:
+    """Vehicle group capacities, demand shares and fleet sizes per hub derived from the order rows
+
+    demand holds daily containers as a days x hubs x vehicle groups array.
+    """
+    def __init__(self, dates, hubs, groups, demand, capacity, fleet_size):
+        self.dates = dates
+        self.hubs = hubs
+        self.groups = groups
+        self.demand = demand
+        self.capacity = capacity
+        self.fleet_size = fleet_size
+        recent = demand[-FLEET_WINDOW_DAYS:].sum(axis=0)
+        self.share = recent / np.maximum(recent.sum(axis=1, keepdims=True), 1)
+        self.total_share = recent.sum(axis=0) / max(recent.sum(), 1)
+
+    @classmethod
+    def from_frame(cls, df, order_types=None, time_of_day='Morning'):
+        """Build the profile from order rows, optionally restricted to order types and a time of day"""
+        mask = df['containers_delivered'].fillna(0).to_numpy() > 0
+        if order_types:
+            mask &= df['order_type'].isin(list(order_types)).to_numpy()
+        if time_of_day is not None:
+            mask &= (df['time_of_day'] == time_of_day).to_numpy()
+        rows = pd.DataFrame({
+            'delivery_date': df['delivery_date'].to_numpy()[mask],
+            'hub_location': df['hub_location'].astype('category').to_numpy()[mask],
+            'vehicle_group': df['vehicle_group'].astype('category').to_numpy()[mask],
+            'vehicle_id': df['vehicle_id'].astype('category').to_numpy()[mask],
+            'containers': df['containers_delivered'].to_numpy()[mask].astype('int32')
+        }).dropna(subset=['hub_location', 'vehicle_group'])
+
+        # Containers each vehicle delivered per day
+        loads = rows.groupby(['delivery_date', 'hub_location', 'vehicle_group', 'vehicle_id'],
+                             observed=True)['containers'].sum().reset_index()
+        hubs = pd.Index(sorted(loads['hub_location'].unique()))
+        groups = pd.Index(sorted(loads['vehicle_group'].unique()))
+        dates = pd.date_range(loads['delivery_date'].min(), loads['delivery_date'].max(), freq='D') \
+            if len(loads) else pd.DatetimeIndex([])
+
+        d = dates.get_indexer(loads['delivery_date'])
+        h = hubs.get_indexer(loads['hub_location'])
+        g = groups.get_indexer(loads['vehicle_group'])
+        demand = np.zeros((len(dates), len(hubs), len(groups)))
+        np.add.at(demand, (d, h, g), loads['containers'].to_numpy())
+        # Vehicles of each group working at each hub per day
+        active = np.zeros(demand.shape, dtype=np.int32)
+        np.add.at(active, (d, h, g), 1)
+
+        capacity = np.full(len(groups), float(DEFAULT_CAPACITY))
+        if len(loads):
+            quantiles = loads.groupby(g)['containers'].quantile(CAPACITY_QUANTILE)
+            capacity[quantiles.index.to_numpy()] = np.maximum(np.floor(quantiles.to_numpy()), 1)
+        fleet_size = active[-FLEET_WINDOW_DAYS:].max(axis=0) if len(dates) else np.zeros((len(hubs), len(groups)), dtype=np.int32)
+        return cls(dates, hubs, groups, demand, capacity, fleet_size)
+
+    @property
+    def nbytes(self):
+        return int(self.demand.nbytes + self.capacity.nbytes + self.fleet_size.nbytes + self.share.nbytes)
+
+    def _hub_share(self, hub=None):
+        if hub is None or hub == "All" or hub not in self.hubs:
+            return self.total_share
+        return self.share[self.hubs.get_loc(hub)]
+
+    def trucks_by_group(self, containers, hub=None):
+        """Trucks per vehicle group for a container count, split by the hub's recent group shares
+
+        The total is the ceiling of the capacity-weighted load, so a small count doesn't
+        take a truck from every group. Each group gets its whole trucks, and the rest go
+        to the groups with the largest part-loads left over.
+        """
+        containers = np.maximum(np.asarray(containers, dtype=float), 0)
+        loads = containers[..., None] * self._hub_share(hub) / self.capacity
+        total = np.ceil(loads.sum(axis=-1) - 1e-9)
+        trucks = np.floor(loads + 1e-9)
+        left = np.maximum(total - trucks.sum(axis=-1), 0)
+        ranks = np.argsort(np.argsort(-(loads - trucks), axis=-1, kind='stable'), axis=-1)
+        return (trucks + (ranks < left[..., None])).astype(int)
+
+    def trucks(self, containers, hub=None):
+        """Trucks needed to carry a number of containers at a hub (or across hubs for None/"All")"""
+        trucks = self.trucks_by_group(containers, hub).sum(axis=-1)
+        return int(trucks) if np.ndim(trucks) == 0 else trucks
+
+    def capacities(self):
+        """Containers per truck by vehicle group"""
+        return {group: int(capacity) for group, capacity in zip(self.groups, self.capacity)}
+
+def forecast_demand(profile, horizon=45, params=None):
+    """Daily containers per hub and vehicle group for the days after the history, as a days x hubs x groups array
+
+    Every hub x vehicle group series of a federal state shares one design matrix, so
+    each state is a single ridge solve whatever the number of series.
+    """
+    params = dict(RIDGE_PARAMS, **(params or {}))
+    history = pd.Series(profile.dates)
+    future = pd.date_range(profile.dates[-1] + pd.Timedelta(days=1), periods=horizon, freq='D')
+    years = range(profile.dates[0].year, future[-1].year + 1)
+    n_hubs, n_groups = len(profile.hubs), len(profile.groups)
+    demand = np.zeros((horizon, n_hubs, n_groups))
+
+    states = np.array([HUB_STATES.get(hub) for hub in profile.hubs], dtype=object)
+    for state in pd.unique(states):
+        in_state = np.flatnonzero(states == state)
+        holidays = calendar_store.holidays(state, min(years), max(years))
+        Y = profile.demand[:, in_state, :].reshape(len(history), -1)
+        models = RidgeModel.fit_many(history, Y, holidays=holidays, **params)
+        yhat = RidgeModel.predict_many(models, future)
+        demand[:, in_state, :] = yhat.reshape(horizon, len(in_state), n_groups)
+    return future, np.maximum(demand, 0)
+
+def plan_fleet(profile, horizon=45, params=None):
+    """One row per hub x day x vehicle group with forecast containers, capacity, trucks and shortfall"""
+    dates, demand = forecast_demand(profile, horizon, params)
+    trucks = np.ceil(demand / profile.capacity - 1e-9).astype(int)
+    shortfall = np.maximum(trucks - profile.fleet_size, 0)
+
+    n_days, n_hubs, n_groups = demand.shape
+    return pd.DataFrame({
+        'delivery_date': np.repeat(dates.to_numpy(), n_hubs * n_groups),
+        'hub_location': np.tile(np.repeat(profile.hubs.to_numpy(), n_groups), n_days),
+        'vehicle_group': np.tile(profile.groups.to_numpy(), n_days * n_hubs),
+        'containers': demand.ravel(),
+        'capacity': np.tile(profile.capacity, n_days * n_hubs).astype(int),
+        'trucks': trucks.ravel(),
+        'fleet_size': np.tile(profile.fleet_size.ravel(), n_days),
+        'shortfall': shortfall.ravel()
+    })
+
+def main():
+    from batch_trainer import get_data_processor, ORDER_TYPES
+    from data_processor import DEFAULT_DATA_PATH
+
+    parser = argparse.ArgumentParser(description="Plan trucks per hub, day and vehicle group")
+    parser.add_argument('--data-path', default=DEFAULT_DATA_PATH)
+    parser.add_argument('--horizon', type=int, default=14, help="Days to plan after the latest delivery date")
+    parser.add_argument('--output', help="CSV file to write the plan to")
+    args = parser.parse_args()
+
+    profile = get_data_processor(args.data_path).get_fleet_profile(order_types=ORDER_TYPES)
+    plan = plan_fleet(profile, horizon=args.horizon)
+    print("Containers per truck: " + ", ".join(f"{g}: {c}" for g, c in profile.capacities().items()))
+    print(plan.groupby(['delivery_date', 'hub_location'])['trucks'].sum().unstack().to_string())
+    short = plan[plan['shortfall'] > 0]
+    if not short.empty:
+        print(f"\n{len(short)} hub x day x vehicle group combinations need more trucks than have recently been in use")
+    if args.output:
+        plan.to_csv(args.output, index=False)
+        print(f"Plan written to {args.output}")
+
+if __name__ == "__main__":
+    main()
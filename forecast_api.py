@@ -0,0 +1,288 @@
+"""Headless HTTP/JSON API for the segment forecasts.
+
+Usage:
+    python forecast_api.py --port 8502 --backend prophet --profile balanced
+
+Endpoints (container_type and hub default to "All"; backend and profile to the server's):
+    GET  /health
+    GET  /segments
+    GET  /forecast/next-day?container_type=M05&hub=HH
+    GET  /forecast/horizon?container_type=M05&hub=HH&days=30
+    GET  /forecast/components?container_type=M05&hub=HH&date=2025-03-03
+    POST /forecast/batch   {"kind": "next-day", "segments": [{"container_type": "M05", "hub": "HH"}]}
+    GET  /fleet/plan?days=14&hub=HH
+
+A batch without "segments" covers every container type x hub combination. Fits are
+shared with the dashboard through the model store, and finished forecasts are kept
+in memory, so repeated queries don't refit.
+"""
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import pandas as pd
+
+from data_processor import DEFAULT_DATA_PATH
+from frame_cache import frame_cache
+from batch_trainer import FORECAST_PERIOD, ORDER_TYPES, get_data_processor, enumerate_segments, prepare_segment
+
+# Longest horizon a client can request, in days after the data
+MAX_HORIZON_DAYS = 365
+COMPONENTS = ['trend', 'weekly', 'yearly', 'holidays', 'daily', 'additive_terms', 'multiplicative_terms']
+
+class BadRequest(ValueError):
+    pass
+
+def _date(value):
+    return pd.Timestamp(value).strftime('%Y-%m-%d')
+
+class ForecastService:
+    def __init__(self, data_path=DEFAULT_DATA_PATH, backend='prophet', workers=4, profile='balanced'):
+        self.data_path = data_path
+        self.backend = backend
+        self.profile = profile
+        self.workers = workers
+
+    @property
+    def data_processor(self):
+        # Reloaded when rows are appended, so answers follow the ingested data
+        return get_data_processor(self.data_path)
+
+    def segments(self):
+        """Every container type x hub combination that can be queried"""
+        return [{'container_type': c, 'hub': h} for c, h in enumerate_segments(self.data_processor)]
+
+    def _check_segment(self, container_type, hub):
+        if (container_type, hub) not in set(enumerate_segments(self.data_processor)):
+            raise BadRequest(f"Unknown segment: container_type={container_type}, hub={hub}")
+
+    def segment_forecast(self, container_type="All", hub="All", backend=None, profile=None,
+                         forecast_period=FORECAST_PERIOD):
+        """(train_df, val_df, forecast) for a segment, built exactly as the dashboard does
+
+        forecast_period counts days after the training data, which ends before the
+        validation days, so longer horizons need a longer period.
+        """
+        from forecaster import Forecaster, BACKENDS, PROFILES
+        from model_store import model_store
+
+        backend = backend or self.backend
+        if backend not in BACKENDS:
+            raise BadRequest(f"Unknown backend: {backend}")
+        profile = profile or self.profile
+        if profile not in PROFILES:
+            raise BadRequest(f"Unknown profile: {profile}")
+        self._check_segment(container_type, hub)
+        key = ('api_forecast', self.data_processor.fingerprint, container_type, hub, backend, profile,
+               forecast_period)
+
+        def compute():
+            train_df, val_df = prepare_segment(self.data_processor, container_type, hub)
+            forecaster = Forecaster(holiday_df=self.data_processor.get_holiday_data(hub=hub), store=model_store,
+                                    segment=(container_type, hub), warm_start=True, backend=backend,
+                                    profile=profile)
+            forecaster.create_model(train_df)
+            forecast = forecaster.make_forecast(train_df, forecast_period=forecast_period)
+            return train_df, val_df, forecast
+
+        return frame_cache.get_or_compute(key, compute)
+
+    def next_day(self, container_type="All", hub="All", backend=None, profile=None):
+        """Containers and trucks needed on the first day after the data, as the dashboard metric shows them"""
+        from forecaster import next_day_forecast
+
+        _, val_df, forecast = self.segment_forecast(container_type, hub, backend, profile)
+        result = {'container_type': container_type, 'hub': hub}
+        row = next_day_forecast(forecast, val_df)
+        if row is None:
+            return dict(result, date=None, containers=None, trucks=None)
+        containers = round(row['yhat'])
+        return dict(
+            result,
+            date=_date(row['ds']),
+            containers=containers,
+            trucks=self.data_processor.get_fleet_profile(order_types=ORDER_TYPES).trucks(containers, hub=hub),
+            yhat=float(row['yhat']),
+            yhat_lower=float(row['yhat_lower']),
+            yhat_upper=float(row['yhat_upper'])
+        )
+
+    def horizon(self, container_type="All", hub="All", days=None, backend=None, profile=None):
+        """Daily forecasts after the last day of data, up to days ahead"""
+        if days is not None and (not str(days).isdigit() or not 0 < int(days) <= MAX_HORIZON_DAYS):
+            raise BadRequest(f"days must be an integer from 1 to {MAX_HORIZON_DAYS}, got {days}")
+        train_df, val_df, forecast = self.segment_forecast(container_type, hub, backend, profile)
+        last_date = max(train_df['ds'].max(), val_df['ds'].max()) if not val_df.empty else train_df['ds'].max()
+        if days is not None:
+            # Extend the forecast when the requested days reach past the default period
+            needed = (last_date - train_df['ds'].max()).days + int(days)
+            if needed > FORECAST_PERIOD:
+                _, _, forecast = self.segment_forecast(container_type, hub, backend, profile, forecast_period=needed)
+        future = forecast[forecast['ds'] > last_date]
+        if days is not None:
+            future = future[future['ds'] <= last_date + pd.Timedelta(days=int(days))]
+        return {
+            'container_type': container_type,
+            'hub': hub,
+            'forecast': [
+                {'date': _date(ds), 'yhat': float(yhat), 'yhat_lower': float(lower), 'yhat_upper': float(upper)}
+                for ds, yhat, lower, upper in zip(future['ds'], future['yhat'], future['yhat_lower'], future['yhat_upper'])
+            ]
+        }
+
+    def components(self, container_type="All", hub="All", date=None, backend=None, profile=None):
+        """Trend, seasonality and holiday components of one forecast day (default: the next day)"""
+        from forecaster import next_day_forecast
+
+        _, val_df, forecast = self.segment_forecast(container_type, hub, backend, profile)
+        if date is None:
+            row = next_day_forecast(forecast, val_df)
+        else:
+            try:
+                date = pd.Timestamp(date)
+            except ValueError:
+                date = pd.NaT
+            if pd.isna(date):
+                raise BadRequest("date must be a date like 2025-03-03")
+            rows = forecast[forecast['ds'] == date]
+            row = rows.iloc[0] if not rows.empty else None
+        if row is None:
+            raise BadRequest(f"No forecast for {_date(date) if date is not None else 'the next day'}")
+        return {
+            'container_type': container_type,
+            'hub': hub,
+            'date': _date(row['ds']),
+            'yhat': float(row['yhat']),
+            'components': {name: float(row[name]) for name in COMPONENTS if name in row.index}
+        }
+
+    def fleet_plan(self, days=14, hub="All"):
+        """Trucks per hub, day and vehicle group for the days after the data"""
+        from fleet_planner import plan_fleet
+
+        if not str(days).isdigit() or not 0 < int(days) <= MAX_HORIZON_DAYS:
+            raise BadRequest(f"days must be an integer from 1 to {MAX_HORIZON_DAYS}, got {days}")
+        profile = self.data_processor.get_fleet_profile(order_types=ORDER_TYPES)
+        if hub != "All" and hub not in profile.hubs:
+            raise BadRequest(f"Unknown hub: {hub}")
+        key = ('api_fleet_plan', self.data_processor.fingerprint, int(days))
+        plan = frame_cache.get_or_compute(key, lambda: plan_fleet(profile, horizon=int(days)))
+        if hub != "All":
+            plan = plan[plan['hub_location'] == hub]
+        return {
+            'capacities': profile.capacities(),
+            'plan': [
+                {'date': _date(row.delivery_date), 'hub': row.hub_location, 'vehicle_group': row.vehicle_group,
+                 'containers': float(row.containers), 'trucks': int(row.trucks), 'fleet_size': int(row.fleet_size),
+                 'shortfall': int(row.shortfall)}
+                for row in plan.itertuples(index=False)
+            ]
+        }
+
+    def batch(self, kind='next-day', segments=None, **options):
+        """Run one query kind for many segments at once, fitting them in parallel"""
+        handlers = {'next-day': self.next_day, 'horizon': self.horizon, 'components': self.components}
+        if kind not in handlers:
+            raise BadRequest(f"Unknown batch kind: {kind}")
+        # Options each kind takes besides backend and profile
+        kind_options = {'next-day': [], 'horizon': ['days'], 'components': ['date']}
+        unknown = sorted(set(options) - {'backend', 'profile'} - set(kind_options[kind]))
+        if unknown:
+            raise BadRequest(f"{kind} batches don't take {', '.join(unknown)}")
+        segments = segments or self.segments()
+        for segment in segments:
+            self._check_segment(segment.get('container_type', "All"), segment.get('hub', "All"))
+
+        def run(segment):
+            return handlers[kind](segment.get('container_type', "All"), segment.get('hub', "All"), **options)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(run, segments))
+
+class ForecastRequestHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, route, params):
+        service = self.service
+        segment = dict(
+            container_type=params.get('container_type', "All"),
+            hub=params.get('hub', "All"),
+            backend=params.get('backend'),
+            profile=params.get('profile')
+        )
+        if route == '/health':
+            return {'status': 'ok'}
+        if route == '/segments':
+            return {'segments': service.segments()}
+        if route == '/forecast/next-day':
+            return service.next_day(**segment)
+        if route == '/forecast/horizon':
+            return service.horizon(days=params.get('days'), **segment)
+        if route == '/forecast/components':
+            return service.components(date=params.get('date'), **segment)
+        if route == '/fleet/plan':
+            return service.fleet_plan(days=params.get('days', 14), hub=params.get('hub', "All"))
+        if route == '/forecast/batch':
+            options = {k: v for k, v in params.items() if k in ('days', 'date', 'backend', 'profile')}
+            return {'results': service.batch(params.get('kind', 'next-day'), params.get('segments'), **options)}
+        return None
+
+    def _dispatch(self, params):
+        route = urlparse(self.path).path.rstrip('/') or '/'
+        try:
+            payload = self._handle(route, params)
+        except BadRequest as e:
+            return self._send(400, {'error': str(e)})
+        except Exception as e:
+            print(f"Error handling {self.path}: {str(e)}")
+            return self._send(500, {'error': str(e)})
+        if payload is None:
+            return self._send(404, {'error': f"Unknown endpoint: {route}"})
+        self._send(200, payload)
+
+    def do_GET(self):
+        params = {k: v[-1] for k, v in parse_qs(urlparse(self.path).query).items()}
+        self._dispatch(params)
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            params = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return self._send(400, {'error': "Body must be JSON"})
+        self._dispatch(params)
+
+def make_server(service, host='127.0.0.1', port=8502):
+    handler = type('Handler', (ForecastRequestHandler,), {'service': service})
+    return ThreadingHTTPServer((host, port), handler)
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve segment forecasts over HTTP/JSON")
+    parser.add_argument('--data-path', default=DEFAULT_DATA_PATH)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8502)
+    parser.add_argument('--backend', default='prophet', choices=['prophet', 'ridge'])
+    parser.add_argument('--profile', default='balanced', choices=['fast', 'balanced', 'accurate'])
+    parser.add_argument('--workers', type=int, default=4, help="Segments fitted in parallel per batch")
+    args = parser.parse_args()
+
+    server = make_server(ForecastService(args.data_path, args.backend, args.workers, args.profile), args.host, args.port)
+    print(f"Serving forecasts on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
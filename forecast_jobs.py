@@ -0,0 +1,90 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Background fits running at once, overridable with FORECAST_WORKERS
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_RESULTS = 32
+
+def fit_forecast(forecaster, train_df, forecast_period=45):
+    """Fit a forecaster and make its forecast; runs on a worker thread"""
+    forecaster.create_model(train_df)
+    forecaster.make_forecast(train_df, forecast_period=forecast_period)
+    return forecaster
+
+class ForecastJobs:
+    """Bounded pool fitting forecasts in the background, with one live job per session
+
+    Sessions asking for the same key share one job. When a session submits a new
+    key, its previous job is cancelled if no other session is waiting for it. A job
+    that is already running cannot be interrupted; it finishes and its result is
+    kept for the next session that asks for the same key.
+    """
+    def __init__(self, max_workers=None, max_results=DEFAULT_MAX_RESULTS):
+        if max_workers is None:
+            max_workers = int(os.environ.get('FORECAST_WORKERS', DEFAULT_WORKERS))
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='forecast')
+        self._lock = threading.RLock()
+        self._jobs = {}                 # key -> running or queued future
+        self._sessions = {}             # session id -> key of its pending job
+        self._results = OrderedDict()   # key -> result, least recently used first
+        self.max_results = max_results
+        self.cancelled = 0
+
+    def submit(self, session_id, key, fn, *args, **kwargs):
+        """Future for a key, starting fn(*args) unless the job is running or already finished"""
+        with self._lock:
+            previous = self._sessions.pop(session_id, None)
+            if previous is not None and previous != key:
+                self._cancel_if_unused(previous)
+
+            if key in self._results:
+                self._results.move_to_end(key)
+                future = Future()
+                future.set_result(self._results[key])
+                return future
+
+            # Recorded before the callback, which removes it once the job is done
+            self._sessions[session_id] = key
+            future = self._jobs.get(key)
+            if future is None:
+                future = self._executor.submit(fn, *args, **kwargs)
+                self._jobs[key] = future
+                future.add_done_callback(lambda done, key=key: self._finish(key, done))
+            return future
+
+    def _cancel_if_unused(self, key):
+        """Cancel a superseded job unless another session still wants it"""
+        if key in self._sessions.values():
+            return
+        future = self._jobs.get(key)
+        if future is not None and future.cancel():
+            self.cancelled += 1
+
+    def _finish(self, key, future):
+        with self._lock:
+            if self._jobs.get(key) is future:
+                del self._jobs[key]
+            # Sessions only need tracking while their job can still be cancelled
+            for session_id in [s for s, k in self._sessions.items() if k == key]:
+                del self._sessions[session_id]
+            if future.cancelled() or future.exception() is not None:
+                return
+            self._results[key] = future.result()
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'running': sum(1 for future in self._jobs.values() if future.running()),
+                'queued': sum(1 for future in self._jobs.values() if not future.running()),
+                'results': len(self._results),
+                'cancelled': self.cancelled,
+                'sessions': len(self._sessions)
+            }
+
+# Shared instance used by every dashboard session
+forecast_jobs = ForecastJobs()
@@ -1,38 +1,241 @@
+import warnings
+from statistics import NormalDist
 import pandas as pd
 import numpy as np
-from prophet import Prophet
+
+from diagnostics import span
+from ridge_model import RidgeModel, RIDGE_PARAMS
+
+# Prophet hyperparameters used by create_model
+DEFAULT_PARAMS = {
+    'yearly_seasonality': True,
+    'weekly_seasonality': True,
+    'daily_seasonality': True,
+    'seasonality_mode': 'multiplicative',
+    'changepoint_prior_scale': 0.05,  # Increased from 0.01 to allow more flexibility
+    'seasonality_prior_scale': 1.0,   # Reduced from 10.0 to prevent overfitting
+    'growth': 'linear'                # Changed from logistic to linear for less constraint
+}
+
+# Default hyperparameters of each backend; Prophet is the accurate mode,
+# the ridge regression the fast one for interactive use
+BACKENDS = {
+    'prophet': DEFAULT_PARAMS,
+    'ridge': RIDGE_PARAMS
+}
+
+# Named trade-offs between speed and fidelity. Each sets the seasonality terms of each
+# backend, Prophet's interval samples (0 for analytic intervals), the days of history
+# that are fitted (None for all of it) and the optimizer's iteration limit
+PROFILES = {
+    'fast': {
+        'seasonality': {
+            'prophet': {'daily_seasonality': False, 'yearly_seasonality': 5},
+            'ridge': {'yearly_order': 4}
+        },
+        'uncertainty_samples': 0,
+        'training_days': 2 * 365,
+        'max_iterations': 500
+    },
+    'balanced': {
+        'seasonality': {
+            'prophet': {'daily_seasonality': False},
+            'ridge': {}
+        },
+        'uncertainty_samples': 200,
+        'training_days': 3 * 365,
+        'max_iterations': 2000
+    },
+    'accurate': {
+        'seasonality': {'prophet': {}, 'ridge': {}},
+        'uncertainty_samples': 1000,
+        'training_days': None,
+        'max_iterations': 10000
+    }
+}
+DEFAULT_PROFILE = 'accurate'
+
+def model_class(backend):
+    """Model class of a backend; Prophet (and cmdstanpy) is only imported once a model is fitted"""
+    if backend == 'prophet':
+        from prophet import Prophet
+        return Prophet
+    return RidgeModel
+
+def forecast_errors(y, yhat, axis=None):
+    """MAPE, sMAPE, RMSE and MAE along an axis, ignoring missing values
+    
+    MAPE skips days with zero actuals instead of dividing by zero; sMAPE counts
+    days where both actual and forecast are zero as a perfect forecast.
+    """
+    y = np.asarray(y, dtype=float)
+    yhat = np.asarray(yhat, dtype=float)
+    error = yhat - y
+    abs_error = np.abs(error)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ape = np.where(y != 0, abs_error / np.abs(y), np.nan)
+        denominator = np.abs(y) + np.abs(yhat)
+        sape = np.where(denominator != 0, 2 * abs_error / denominator, 0.0)
+    sape = np.where(np.isnan(error), np.nan, sape)
+    
+    # All-missing slices give nan rather than a warning
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        return {
+            'mape': np.nanmean(ape, axis=axis) * 100,
+            'smape': np.nanmean(sape, axis=axis) * 100,
+            'rmse': np.sqrt(np.nanmean(error ** 2, axis=axis)),
+            'mae': np.nanmean(abs_error, axis=axis)
+        }
+
+def next_day_forecast(forecast, val_df):
+    """Forecast row for the first day after the validation data, or None if there is none
+    
+    This is the day behind the "Containers Needed Next Day" metric.
+    """
+    if val_df is None or val_df.empty:
+        return None
+    future_forecast = forecast[forecast['ds'] > val_df['ds'].max()]
+    if future_forecast.empty:
+        return None
+    return future_forecast.loc[future_forecast['ds'].idxmin()]
+
+def forecast_name(forecast_period, include_history=False, uncertainty_samples=None):
+    """Name under which a forecast variant is stored in the model store"""
+    name = str(forecast_period) if include_history else f"{forecast_period}_future"
+    if uncertainty_samples is not None:
+        name += f"_s{uncertainty_samples}"
+    return name
+
+def predict(model, dates, uncertainty_samples=None):
+    """Forecast with its components for the given dates in one pass
+    
+    uncertainty_samples sets the number of simulated paths Prophet draws for the
+    interval; 0 skips the simulation and derives the interval analytically from the
+    fitted noise level. None keeps the model's own setting. The ridge backend's
+    intervals are always analytic.
+    """
+    if uncertainty_samples is None or getattr(model, 'backend', 'prophet') != 'prophet':
+        return model.predict(dates)
+    
+    default_samples = model.uncertainty_samples
+    model.uncertainty_samples = uncertainty_samples
+    try:
+        forecast = model.predict(dates)
+    finally:
+        model.uncertainty_samples = default_samples
+    
+    if not uncertainty_samples:
+        # Observation noise of the fit, in containers
+        sigma = float(np.mean(model.params['sigma_obs'])) * model.y_scale
+        z = NormalDist().inv_cdf(0.5 + model.interval_width / 2)
+        forecast['yhat_lower'] = forecast['yhat'] - z * sigma
+        forecast['yhat_upper'] = forecast['yhat'] + z * sigma
+    return forecast
+
+def warm_start_params(model):
+    """Fitted parameters of a previous model, used to initialize the optimizer"""
+    init = {}
+    for name in ['k', 'm', 'sigma_obs']:
+        init[name] = float(np.mean(model.params[name]))
+    for name in ['delta', 'beta']:
+        init[name] = np.mean(model.params[name], axis=0)
+    return init
 
 class Forecaster:
-    def __init__(self, holiday_df=None):
+    def __init__(self, holiday_df=None, store=None, segment=None, params=None, warm_start=False, backend='prophet',
+                 profile=DEFAULT_PROFILE):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown forecasting backend: {backend}")
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown forecast profile: {profile}")
         self.holiday_df = holiday_df
+        self.store = store
+        self.segment = segment
+        self.backend = backend
+        self.profile = profile
+        settings = PROFILES[profile]
+        self.params = dict(BACKENDS[backend])
+        self.params.update(settings['seasonality'][backend])
+        self.params.update(params or {})
+        self.uncertainty_samples = settings['uncertainty_samples']
+        self.training_days = settings['training_days']
+        self.max_iterations = settings['max_iterations']
         self.model = None
         self.forecast = None
+        self.model_key = None
+        self.from_store = False
+        # Seed fits with the segment's previous model when its data changed
+        self.warm_start = warm_start
+        self.warm_started = False
         
+    def training_window(self, train_df):
+        """The days of train_df the profile fits on"""
+        if self.training_days is None or train_df.empty:
+            return train_df
+        return train_df[train_df['ds'] > train_df['ds'].max() - pd.Timedelta(days=self.training_days)]
+    
     def create_model(self, train_df):
-        """Create and fit Prophet model"""
-        self.model = Prophet(
-            yearly_seasonality=True,
-            weekly_seasonality=True,
-            daily_seasonality=True,
-            seasonality_mode='multiplicative',
-            changepoint_prior_scale=0.05,  # Increased from 0.01 to allow more flexibility
-            seasonality_prior_scale=1.0,   # Reduced from 10.0 to prevent overfitting
-            holidays=self.holiday_df,
-            growth='linear'                # Changed from logistic to linear for less constraint
-        )
-        
-        # Fit the model without floor and cap constraints
-        self.model.fit(train_df)
+        """Create and fit the model on the profile's training window, reusing a stored fit when one matches"""
+        self.forecast = None
+        train_df = self.training_window(train_df)
+        fit_options = {'iter': self.max_iterations} if self.backend == 'prophet' else {}
+        if self.store is not None:
+            key_params = dict(self.params, **{f"fit_{name}": value for name, value in fit_options.items()})
+            self.model_key = self.store.make_key(self.segment, train_df, self.holiday_df, key_params)
+            self.model = self.store.load_model(self.model_key)
+            self.from_store = self.model is not None
+            if self.from_store:
+                return self.model
+
+        init = None
+        # Only Prophet fits are slow enough to be worth warm-starting
+        if self.warm_start and self.store is not None and self.backend == 'prophet':
+            previous = self.store.latest_model(self.segment, self.params)
+            if previous is not None:
+                init = warm_start_params(previous)
+        self.warm_started = init is not None
+
+        self.model = model_class(self.backend)(holidays=self.holiday_df, **self.params)
         
+        # Fit the model without floor and cap constraints. Prophet falls back to its
+        # default initialization for any warm-start parameter whose shape changed
+        with span('forecast.fit', backend=self.backend, profile=self.profile, warm_started=self.warm_started,
+                  rows=len(train_df)):
+            if init is not None:
+                self.model.fit(train_df, init=init, **fit_options)
+            else:
+                self.model.fit(train_df, **fit_options)
+        
+        if self.store is not None:
+            self.store.save_model(self.model_key, self.model, segment=self.segment, params=self.params)
+
         return self.model
     
-    def make_forecast(self, train_df, forecast_period=45):
-        """Make future predictions"""
-        # Make future predictions including validation period
-        future_dates = self.model.make_future_dataframe(periods=forecast_period)
+    def make_forecast(self, train_df, forecast_period=45, include_history=False, uncertainty_samples=None):
+        """Predict the forecast_period days after the training data, with components
+        
+        Only the future days are predicted unless include_history is set, so the cost
+        grows with the horizon and not with the history. See predict for uncertainty_samples;
+        by default the profile's setting is used.
+        """
+        if uncertainty_samples is None:
+            uncertainty_samples = self.uncertainty_samples
+        name = forecast_name(forecast_period, include_history, uncertainty_samples)
+        if self.store is not None and self.model_key is not None:
+            self.forecast = self.store.load_forecast(self.model_key, name)
+            if self.forecast is not None:
+                return self.forecast
+
+        # The days after the training data, which include the validation period
+        future_dates = self.model.make_future_dataframe(periods=forecast_period, include_history=include_history)
         
-        self.forecast = self.model.predict(future_dates)
+        with span('forecast.predict', rows=len(future_dates), uncertainty_samples=uncertainty_samples):
+            self.forecast = predict(self.model, future_dates, uncertainty_samples)
         
+        if self.store is not None and self.model_key is not None:
+            self.store.save_forecast(self.model_key, name, self.forecast)
+
         return self.forecast
     
     def calculate_metrics(self, val_df):
@@ -40,12 +243,10 @@ class Forecaster:
         if self.forecast is None or val_df is None:
             return None, None
             
-        val_forecast = self.forecast[self.forecast['ds'].isin(val_df['ds'])]
-        
-        # Calculate MAPE (Mean Absolute Percentage Error)
-        mape = np.mean(np.abs((val_df['y'].values - val_forecast['yhat'].values) / val_df['y'].values)) * 100
+        # Align forecasts with the validation days by date
+        val_forecast = val_df[['ds', 'y']].merge(self.forecast[['ds', 'yhat']], on='ds', how='left')
         
-        # Calculate RMSE (Root Mean Square Error)
-        rmse = np.sqrt(np.mean((val_df['y'].values - val_forecast['yhat'].values)**2))
+        # MAPE (ignoring zero-delivery days) and RMSE
+        errors = forecast_errors(val_forecast['y'], val_forecast['yhat'])
         
-        return mape, rmse 
\ No newline at end of file
+        return errors['mape'], errors['rmse'] 
\ No newline at end of file
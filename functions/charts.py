@@ -1,9 +1,13 @@
-import plotly.express as px
-import plotly.graph_objects as go
 from styles.theme import OTTO_DORNER_BLUE
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 
+# Above this many points in the window, mode='auto' draws WebGL traces
+WEBGL_THRESHOLD = 1000
+# Points kept per series by LTTB downsampling in WebGL mode
+WEBGL_MAX_POINTS = 1500
+
 def create_branded_chart(fig, title):
     """Apply Otto Dörner branding to a chart"""
     fig.update_layout(
@@ -24,59 +28,121 @@ def create_branded_chart(fig, title):
     )
     return fig
 
-def create_forecast_chart(train_df, val_df, forecast, title="Forecast"):
-    """Create a forecast visualization chart"""
-    fig = go.Figure()
+def lttb_indices(x, y, threshold):
+    """Indices of the points kept by Largest-Triangle-Three-Buckets downsampling
+    
+    Keeps the first and last point and, from each bucket in between, the point that
+    forms the largest triangle with the previously kept point and the next bucket's
+    average, which preserves peaks and dips.
+    """
+    n = len(x)
+    if threshold is None or threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        kept[i + 1] = a
+    return kept
 
-    # Filter forecast to only show data for 2025
-    forecast_2025 = forecast[forecast['ds'].dt.year == 2025]
+def _downsample(df, column, max_points):
+    """Rows of df kept by LTTB on one of its columns"""
+    if max_points is None or len(df) <= max_points:
+        return df
+    x = df['ds'].to_numpy().astype('datetime64[ns]').astype(np.int64)
+    return df.iloc[lttb_indices(x, df[column].to_numpy(), max_points)]
+
+def create_forecast_chart(train_df, val_df, forecast, title="Forecast", window_start=None, window_end=None,
+                          mode='svg', max_points=None):
+    """Create a forecast visualization chart
+    
+    History is shown from window_start (default: January 1st of the latest year in the
+    data) to window_end. mode='webgl' draws WebGL traces and downsamples every series
+    to max_points (default WEBGL_MAX_POINTS) with LTTB; mode='auto' switches to it when
+    the window holds more than WEBGL_THRESHOLD points.
+    """
+    # Plotly is only imported once a chart is drawn
+    import plotly.graph_objects as go
     
+    fig = go.Figure()
+
     # Determine the last month in the available data
     last_date_in_data = max(train_df['ds'].max(), val_df['ds'].max())
     forecast_start_date = last_date_in_data - timedelta(days=30)  # Last month of data
     forecast_end_date = last_date_in_data + timedelta(days=60)    # Next 2 months
     
+    # Show the latest year unless a window is given
+    if window_start is None:
+        window_start = pd.Timestamp(year=last_date_in_data.year, month=1, day=1)
+    window_start = pd.Timestamp(window_start)
+    window_end = pd.Timestamp(window_end) if window_end is not None else forecast_end_date
+    
+    def in_window(df):
+        return df[(df['ds'] >= window_start) & (df['ds'] <= window_end)]
+    
     # Keep only actual data before the forecast
-    forecast_data = forecast_2025[
-        (forecast_2025['ds'] >= forecast_start_date) & 
-        (forecast_2025['ds'] <= forecast_end_date)
-    ]
+    forecast_data = in_window(forecast[
+        (forecast['ds'] >= forecast_start_date) & 
+        (forecast['ds'] <= forecast_end_date)
+    ])
+    train_window = in_window(train_df)
+    val_window = in_window(val_df)
     
-    # Plot training data for 2025 (visible)
-    train_2025 = train_df[train_df['ds'].dt.year == 2025]
-    if not train_2025.empty:
-        fig.add_trace(go.Scatter(
-            x=train_2025['ds'],
-            y=train_2025['y'],
+    if mode == 'auto':
+        mode = 'webgl' if len(train_window) + len(val_window) + len(forecast_data) > WEBGL_THRESHOLD else 'svg'
+    if mode == 'webgl':
+        Scatter = go.Scattergl
+        max_points = max_points or WEBGL_MAX_POINTS
+        train_window = _downsample(train_window, 'y', max_points)
+        val_window = _downsample(val_window, 'y', max_points)
+        forecast_data = _downsample(forecast_data, 'yhat', max_points)
+    else:
+        Scatter = go.Scatter
+    
+    # Plot training data in the window (visible)
+    if not train_window.empty:
+        fig.add_trace(Scatter(
+            x=train_window['ds'].to_numpy(),
+            y=train_window['y'].to_numpy(),
             name='Historical Data',
             mode='markers+lines',
             line=dict(color=OTTO_DORNER_BLUE)
         ))
     
-    # Plot validation data for 2025 (visible)
-    val_2025 = val_df[val_df['ds'].dt.year == 2025]
-    if not val_2025.empty:
-        fig.add_trace(go.Scatter(
-            x=val_2025['ds'],
-            y=val_2025['y'],
+    # Plot validation data in the window (visible)
+    if not val_window.empty:
+        fig.add_trace(Scatter(
+            x=val_window['ds'].to_numpy(),
+            y=val_window['y'].to_numpy(),
             name='Validation Data',
             mode='markers+lines',
             line=dict(color='#FF9900')
         ))
 
     # Plot only the forecast period
-    fig.add_trace(go.Scatter(
-        x=forecast_data['ds'],
-        y=forecast_data['yhat'].clip(lower=0),
+    forecast_ds = forecast_data['ds'].to_numpy()
+    fig.add_trace(Scatter(
+        x=forecast_ds,
+        y=forecast_data['yhat'].clip(lower=0).to_numpy(),
         name='Forecast',
         mode='lines',
         line=dict(color='#00CC96', dash='dash')
     ))
 
     # Add confidence intervals for the forecast period only
-    fig.add_trace(go.Scatter(
-        x=forecast_data['ds'].tolist() + forecast_data['ds'].tolist()[::-1],
-        y=forecast_data['yhat_upper'].tolist() + forecast_data['yhat_lower'].tolist()[::-1],
+    fig.add_trace(Scatter(
+        x=np.concatenate([forecast_ds, forecast_ds[::-1]]),
+        y=np.concatenate([forecast_data['yhat_upper'].to_numpy(), forecast_data['yhat_lower'].to_numpy()[::-1]]),
         fill='toself',
         fillcolor='rgba(0, 204, 150, 0.2)',
         line=dict(color='rgba(255, 255, 255, 0)'),
@@ -84,17 +150,11 @@ def create_forecast_chart(train_df, val_df, forecast, title="Forecast"):
     ))
 
     # Find the actual date range to display (only months with data)
-    # Combine all the data that will be displayed in the chart
-    all_displayed_dates = []
-    if not train_2025.empty:
-        all_displayed_dates.extend(train_2025['ds'].tolist())
-    if not val_2025.empty:
-        all_displayed_dates.extend(val_2025['ds'].tolist())
-    all_displayed_dates.extend(forecast_data['ds'].tolist())
+    displayed = [df['ds'] for df in [train_window, val_window, forecast_data] if not df.empty]
     
-    if all_displayed_dates:
-        min_date = min(all_displayed_dates)
-        max_date = max(all_displayed_dates)
+    if displayed:
+        min_date = min(ds.min() for ds in displayed)
+        max_date = max(ds.max() for ds in displayed)
         
         # Set to beginning of the month for min date
         display_start = pd.Timestamp(year=min_date.year, month=min_date.month, day=1)
@@ -106,11 +166,14 @@ def create_forecast_chart(train_df, val_df, forecast, title="Forecast"):
             display_end = pd.Timestamp(year=max_date.year, month=max_date.month+1, day=1) - pd.Timedelta(days=1)
     else:
         # Fallback if no data
-        display_start = pd.Timestamp('2025-01-01')
-        display_end = pd.Timestamp('2025-01-31')
+        display_start = window_start
+        display_end = window_start + pd.offsets.MonthEnd(0)
 
     # Update title to reflect the period being shown
-    title = f"{title} ({display_start.strftime('%b')} - {display_end.strftime('%b')} 2025)"
+    if display_start.year == display_end.year:
+        title = f"{title} ({display_start.strftime('%b')} - {display_end.strftime('%b')} {display_end.year})"
+    else:
+        title = f"{title} ({display_start.strftime('%b %Y')} - {display_end.strftime('%b %Y')})"
     fig = create_branded_chart(fig, title)
     
     # Set x-axis range to only the months being used
@@ -123,4 +186,4 @@ def create_forecast_chart(train_df, val_df, forecast, title="Forecast"):
         )
     )
     
-    return fig 
\ No newline at end of file
+    return fig
@@ -1,12 +1,11 @@
 import streamlit as st
-import requests
-from io import BytesIO
-from PIL import Image
 from styles.theme import STYLES
 
 def load_logo():
     """Load Otto Dörner logo from local file"""
     try:
+        from PIL import Image
+        
         # Load logo from local file
         return Image.open("data/otto_dorner_logo.webp")
     except Exception as e:
@@ -0,0 +1,152 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+from forecaster import Forecaster, DEFAULT_PROFILE
+
+# Reconciliation methods, from the cheapest to the one that uses the error correlations
+RECONCILIATION_METHODS = ['bottom_up', 'wls', 'mint_shrink']
+DEFAULT_METHOD = 'mint_shrink'
+
+def summing_matrix(bottom):
+    """Segments of the hierarchy and the matrix summing bottom-level series into every segment
+
+    bottom is a list of (container_type, hub) pairs. The hierarchy is the total, one
+    series per hub, one per container type and the bottom level, in that order, so
+    the last len(bottom) rows of the matrix are the identity.
+    """
+    containers = sorted({c for c, _ in bottom})
+    hubs = sorted({h for _, h in bottom})
+    segments = [("All", "All")] + [("All", h) for h in hubs] + [(c, "All") for c in containers] + list(bottom)
+
+    row_c = np.array([c for c, _ in segments], dtype=object)[:, None]
+    row_h = np.array([h for _, h in segments], dtype=object)[:, None]
+    bottom_c = np.array([c for c, _ in bottom], dtype=object)[None, :]
+    bottom_h = np.array([h for _, h in bottom], dtype=object)[None, :]
+    S = ((row_c == "All") | (row_c == bottom_c)) & ((row_h == "All") | (row_h == bottom_h))
+    return segments, S.astype(float)
+
+def shrink_covariance(residuals):
+    """Covariance of the in-sample errors with the correlations shrunk towards zero
+
+    The shrinkage intensity is estimated from the data (Schäfer and Strimmer), which
+    keeps the matrix invertible when there are many series and few days.
+    """
+    residuals = residuals - residuals.mean(axis=0)
+    n_days = residuals.shape[0]
+    std = np.maximum(residuals.std(axis=0), 1e-8)
+    scaled = residuals / std
+    corr = scaled.T @ scaled / n_days
+    # Variance of each correlation estimate from the per-day products
+    products = scaled[:, :, None] * scaled[:, None, :]
+    corr_var = products.var(axis=0) * n_days ** 2 / max(n_days - 1, 1) ** 3
+    off_diagonal = ~np.eye(len(corr), dtype=bool)
+    denominator = (corr[off_diagonal] ** 2).sum()
+    intensity = np.clip(corr_var[off_diagonal].sum() / denominator, 0, 1) if denominator > 0 else 1.0
+    shrunk = np.where(off_diagonal, (1 - intensity) * corr, 1.0)
+    return shrunk * np.outer(std, std)
+
+def reconcile(base, S, method=DEFAULT_METHOD, residuals=None):
+    """Coherent forecasts from base forecasts of every segment (segments x days)
+
+    bottom_up sums the bottom-level forecasts. wls and mint_shrink project all base
+    forecasts onto the coherent space, weighting each segment by its in-sample error
+    variance (wls) or the shrunk error covariance (mint_shrink).
+    """
+    n_bottom = S.shape[1]
+    if method == 'bottom_up':
+        return S @ base[-n_bottom:]
+    if method not in RECONCILIATION_METHODS:
+        raise ValueError(f"Unknown reconciliation method: {method}")
+    if residuals is None:
+        raise ValueError(f"{method} reconciliation needs the in-sample residuals")
+
+    if method == 'wls':
+        W = np.diag(np.maximum(residuals.var(axis=0), 1e-8))
+    else:
+        W = shrink_covariance(residuals)
+    W_inv_S = np.linalg.solve(W, S)
+    G = np.linalg.solve(S.T @ W_inv_S, W_inv_S.T)
+    return S @ (G @ base)
+
+class HierarchicalForecaster:
+    """Forecasts for every container type x hub selection, fitted once and reconciled
+
+    Each segment, including the "All" rollups, is fitted with Forecaster; reconciliation
+    then makes the rollups equal the sum of their parts. Components of each segment's
+    forecast are kept, and the reconciliation adjustment is added to yhat and its interval.
+    """
+    def __init__(self, data_processor, store=None, backend='prophet', method=DEFAULT_METHOD,
+                 order_types=None, params=None, workers=None, profile=DEFAULT_PROFILE):
+        self.data_processor = data_processor
+        self.store = store
+        self.backend = backend
+        self.method = method
+        self.order_types = order_types
+        self.params = params
+        self.profile = profile
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.segments = None
+        self.data = {}
+        self.forecasts = {}
+
+    def _series(self, container_type, hub):
+        daily_counts = self.data_processor.get_daily_counts(
+            order_types=self.order_types,
+            container_type=None if container_type == "All" else container_type,
+            hub=None if hub == "All" else hub
+        )
+        return self.data_processor.prepare_forecast_data(daily_counts)
+
+    def _fit_segment(self, segment, forecast_period):
+        container_type, hub = segment
+        train_df, val_df = self._series(container_type, hub)
+        forecaster = Forecaster(holiday_df=self.data_processor.get_holiday_data(hub=hub), store=self.store,
+                                segment=segment, params=self.params, warm_start=True, backend=self.backend,
+                                profile=self.profile)
+        forecaster.create_model(train_df)
+        # The fitted history gives the in-sample errors used by the reconciliation
+        forecast = forecaster.make_forecast(train_df, forecast_period=forecast_period, include_history=True)
+        return train_df, val_df, forecast
+
+    def fit(self, forecast_period=45):
+        """Fit every segment once and reconcile the forecasts"""
+        containers = self.data_processor.get_dimension_values('container_type', order_types=self.order_types)
+        hubs = self.data_processor.get_dimension_values('hub_location', order_types=self.order_types)
+        self.segments, S = summing_matrix([(c, h) for c in containers for h in hubs])
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map(lambda segment: self._fit_segment(segment, forecast_period), self.segments))
+
+        # Align every forecast on the same days
+        days = results[0][2]['ds']
+        base = np.vstack([forecast.set_index('ds')['yhat'].reindex(days).to_numpy() for _, _, forecast in results])
+        # The fitted days, which the profile's training window may shorten
+        in_sample = days.isin(results[0][0]['ds']).to_numpy()
+        train_days = days[in_sample]
+        actual = np.column_stack([train_df.set_index('ds')['y'].reindex(train_days).to_numpy() for train_df, _, _ in results])
+        residuals = np.nan_to_num(actual - base[:, in_sample].T)
+
+        reconciled = reconcile(np.nan_to_num(base), S, self.method, residuals)
+        adjustment = reconciled - base
+        for i, (segment, (train_df, val_df, forecast)) in enumerate(zip(self.segments, results)):
+            forecast = forecast.copy()
+            shift = pd.Series(adjustment[i], index=days).reindex(forecast['ds']).fillna(0).to_numpy()
+            for column in ['yhat', 'yhat_lower', 'yhat_upper']:
+                forecast[column] = forecast[column] + shift
+            self.data[segment] = (train_df, val_df)
+            self.forecasts[segment] = forecast
+        return self
+
+    def forecast(self, container_type="All", hub="All"):
+        """(train_df, val_df, forecast) of a selection from the reconciled set"""
+        segment = (container_type, hub)
+        if segment not in self.forecasts:
+            raise KeyError(f"Segment not in the hierarchy: {segment}")
+        train_df, val_df = self.data[segment]
+        return train_df, val_df, self.forecasts[segment]
+
+    @property
+    def nbytes(self):
+        return sum(int(f.memory_usage(deep=True).sum()) for f in self.forecasts.values())
@@ -0,0 +1,303 @@
+"""Ingest the yearly raw exports into one dataset partitioned by year and month.
+
+Usage:
+    python ingest.py --source-dir data --output data/combined
+
+Every MMX_Hackathon2025_year*.csv / .xlsx export is decoded in its own worker process.
+Encodings, column names, dates and times are normalized, and each file's rows are
+written under year=YYYY/month=M/. Files that have not changed since the last run are
+skipped. Point the dashboard at the result with DATA_PATH=data/combined.
+
+    python ingest.py --watch data/incoming --data-path data/combined
+
+Watches a drop directory for new delivery files (same columns as the exports) and
+appends their rows to the dataset's cache as they arrive, without rebuilding it.
+Appended files are moved to processed/, files that fail validation to rejected/.
+"""
+import os
+import re
+import glob
+import json
+import time
+import shutil
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from data_processor import DataProcessor, DEFAULT_DATA_PATH, COLUMN_MAPPING, DELIVERY_DATE_FORMATS, ORDER_DATETIME_FORMATS, parse_dates
+
+EXPORT_PATTERNS = ['MMX_Hackathon2025_year*.csv', 'MMX_Hackathon2025_year*.xlsx']
+DATASET_DIR = 'data/combined'
+MANIFEST_NAME = '_ingested.json'
+DROP_PATTERNS = ['*.csv', '*.xlsx']
+# Files modified more recently than this may still be being written
+SETTLE_SECONDS = 2
+# Encodings tried in order; the 2021 and 2025 exports are ISO-8859-1
+ENCODINGS = ['utf-8-sig', 'ISO-8859-1']
+
+# Declared schema of the raw columns so every file writes identical partitions
+RAW_SCHEMA = pa.schema([
+    ('LiefKWJ', pa.int64()),
+    ('Monat', pa.int64()),
+    ('LiefDatum', pa.string()),
+    ('LiefZeitV', pa.string()),
+    ('LiefZeitB', pa.string()),
+    ('CVgId', pa.int64()),
+    ('Typ', pa.string()),
+    ('LoAdrId', pa.int64()),
+    ('LoPlz', pa.float64()),
+    ('LoOrt', pa.string()),
+    ('DspGrpKz', pa.string()),
+    ('DspZenKz', pa.string()),
+    ('AArtKz', pa.string()),
+    ('ConTyp', pa.string()),
+    ('CSAnz', pa.int64()),
+    ('CHAnz', pa.int64()),
+    ('FzgNr', pa.string()),
+    ('Bez', pa.string()),
+    ('Plz', pa.float64()),
+    ('Ort', pa.string()),
+    ('AddDatum', pa.string()),
+    ('EntPlz', pa.float64()),
+    ('EntOrt', pa.string()),
+    ('year', pa.int64()),
+    ('month', pa.int64())
+])
+
+def find_exports(source_dir):
+    """Raw yearly export files in a directory"""
+    files = []
+    for pattern in EXPORT_PATTERNS:
+        files.extend(glob.glob(os.path.join(source_dir, pattern)))
+    return sorted(files)
+
+def read_export(path):
+    """Read one raw export with whatever encoding and delimiter it uses"""
+    if path.endswith('.xlsx'):
+        return pd.read_excel(path)
+    for encoding in ENCODINGS:
+        try:
+            with open(path, encoding=encoding) as f:
+                header = f.readline()
+            # Some exports use ';' and others ',' as the delimiter
+            sep = ';' if header.count(';') > header.count(',') else ','
+            return pd.read_csv(path, encoding=encoding, sep=sep, dtype=str)
+        except UnicodeDecodeError:
+            continue
+    raise ValueError(f"Could not decode {path} with any of {ENCODINGS}")
+
+def normalize_columns(df):
+    """Map column names to the canonical raw names regardless of case and stray whitespace"""
+    canonical = {name.lower(): name for name in COLUMN_MAPPING}
+    renamed = {col: canonical.get(str(col).strip().lstrip('\ufeff').lower(), str(col).strip()) for col in df.columns}
+    df = df.rename(columns=renamed)
+    missing = [name for name in COLUMN_MAPPING if name not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {missing}")
+    return df[list(COLUMN_MAPPING)]
+
+def normalize_time(values):
+    """HH:MM:SS strings from times stored as text, datetimes or datetime.time"""
+    text = values.astype(str).str.extract(r'(\d{1,2}:\d{2})(:\d{2})?\s*$')
+    return (text[0].str.zfill(5) + text[1].fillna(':00')).where(text[0].notna())
+
+def normalize_export(df):
+    """Normalize one export to the raw schema with ISO dates and HH:MM:SS times"""
+    df = normalize_columns(df)
+    delivery_date = parse_dates(df['LiefDatum'], DELIVERY_DATE_FORMATS, length=10)
+    df['LiefDatum'] = delivery_date.dt.strftime('%Y-%m-%d')
+    for col in ['LiefZeitV', 'LiefZeitB']:
+        df[col] = normalize_time(df[col])
+    # Excel exports store AddDatum as "['date', 'time']"
+    order_datetime = parse_dates(
+        df['AddDatum'].astype(str).str.strip("[]").str.replace(r"[',]", '', regex=True),
+        ORDER_DATETIME_FORMATS
+    )
+    df['AddDatum'] = order_datetime.dt.strftime('%Y-%m-%d %H:%M:%S')
+
+    for field in RAW_SCHEMA:
+        if field.name not in df.columns:
+            continue
+        if pa.types.is_string(field.type):
+            df[field.name] = df[field.name].where(df[field.name].isna(), df[field.name].astype(str))
+        else:
+            df[field.name] = pd.to_numeric(df[field.name], errors='coerce')
+    for col in ['LiefKWJ', 'Monat', 'CVgId', 'LoAdrId', 'CSAnz', 'CHAnz']:
+        df[col] = df[col].astype('Int64')
+
+    df['year'] = delivery_date.dt.year.astype('Int64')
+    df['month'] = delivery_date.dt.month.astype('Int64')
+    return df[delivery_date.notna()]
+
+def source_stem(path):
+    """Prefix of the partition files written for one export"""
+    return re.sub(r'[^A-Za-z0-9_-]', '_', os.path.splitext(os.path.basename(path))[0])
+
+def remove_partitions(output_dir, stem):
+    """Delete the partition files previously written for an export"""
+    for path in glob.glob(os.path.join(output_dir, 'year=*', 'month=*', f"{stem}-*.parquet")):
+        os.remove(path)
+
+def ingest_file(path, output_dir):
+    """Decode, normalize and write one export; runs in a worker process"""
+    df = normalize_export(read_export(path))
+    stem = source_stem(path)
+    remove_partitions(output_dir, stem)
+    table = pa.Table.from_pandas(df, schema=RAW_SCHEMA, preserve_index=False)
+    pq.write_to_dataset(
+        table,
+        root_path=output_dir,
+        partition_cols=['year', 'month'],
+        basename_template=f"{stem}-{{i}}.parquet",
+        existing_data_behavior='overwrite_or_ignore'
+    )
+    return len(df)
+
+def file_signature(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+def run_ingest(source_dir='data', output_dir=DATASET_DIR, workers=None, force=False):
+    """Ingest every new or changed export in parallel; returns rows written per file"""
+    if force and os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    manifest = load_manifest(output_dir)
+    exports = find_exports(source_dir)
+    pending = [path for path in exports if manifest.get(os.path.basename(path)) != file_signature(path)]
+    print(f"{len(exports)} exports found, {len(pending)} new or changed")
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(ingest_file, path, output_dir): path for path in pending}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                results[path] = future.result()
+            except Exception as e:
+                print(f"{os.path.basename(path)} failed: {str(e)}")
+                continue
+            manifest[os.path.basename(path)] = file_signature(path)
+            print(f"{os.path.basename(path)}: {results[path]} rows")
+
+    # Exports that were removed from the source directory are removed from the dataset too
+    for name in list(manifest):
+        if name not in {os.path.basename(path) for path in exports}:
+            remove_partitions(output_dir, source_stem(name))
+            del manifest[name]
+    save_manifest(output_dir, manifest)
+    return results
+
+def find_drops(drop_dir):
+    """Delivery files in the drop directory that have finished being written"""
+    files = []
+    for pattern in DROP_PATTERNS:
+        files.extend(glob.glob(os.path.join(drop_dir, pattern)))
+    settled = time.time() - SETTLE_SECONDS
+    return sorted(path for path in files if os.path.getmtime(path) < settled)
+
+def validate_drop(df):
+    """Check a normalized delivery file before its rows are appended"""
+    if df.empty:
+        raise ValueError("no rows with a valid delivery date")
+    if df['CVgId'].isna().any():
+        raise ValueError(f"{int(df['CVgId'].isna().sum())} rows without an order id")
+    if (df['CSAnz'].fillna(0) < 0).any() or (df['CHAnz'].fillna(0) < 0).any():
+        raise ValueError("negative container counts")
+    return df
+
+def affected_segments(df):
+    """Container type x hub selections whose daily counts the appended rows change, rollups included"""
+    pairs = set(zip(df['container_type'].astype(str), df['hub_location'].astype(str)))
+    segments = set(pairs)
+    segments.update(("All", h) for _, h in pairs)
+    segments.update((c, "All") for c, _ in pairs)
+    segments.add(("All", "All"))
+    return sorted(segments)
+
+def move_drop(path, folder):
+    """Move a handled drop file into a subfolder of the drop directory"""
+    target_dir = os.path.join(os.path.dirname(path), folder)
+    os.makedirs(target_dir, exist_ok=True)
+    os.replace(path, os.path.join(target_dir, os.path.basename(path)))
+
+def ingest_drop(path, data_processor):
+    """Append one drop file's new rows to the dataset; returns the appended rows"""
+    df = validate_drop(normalize_export(read_export(path)))
+    data_processor.load_data(columns=['delivery_date'])
+    latest = data_processor.get_latest_date()
+    appended = data_processor.append_rows(df)
+    name = os.path.basename(path)
+    if appended.empty:
+        print(f"{name}: {len(df)} rows, all already in the dataset")
+        return appended
+
+    segments = [f"{c}/{h}" for c, h in affected_segments(appended) if "All" not in (c, h)]
+    print(f"{name}: {len(appended)} new rows from {appended['delivery_date'].min():%Y-%m-%d} "
+          f"to {appended['delivery_date'].max():%Y-%m-%d}, segments {', '.join(segments)}")
+    if latest is not None and appended['delivery_date'].max() > latest:
+        # The forecast windows of every segment move with the latest delivery date
+        print(f"Latest delivery date moved to {appended['delivery_date'].max():%Y-%m-%d}")
+    return appended
+
+def watch(drop_dir, data_path=DEFAULT_DATA_PATH, interval=10, once=False):
+    """Append new files from the drop directory as they arrive
+
+    Forecast caches are keyed on the data, so only the segments whose training data
+    changed are refitted the next time they are requested.
+    """
+    # A private copy, so only the sessions' next loads publish the shared dataset, once per scan
+    data_processor = DataProcessor(data_path=data_path, shared=False)
+    print(f"Watching {drop_dir} for delivery files")
+    while True:
+        for path in find_drops(drop_dir):
+            try:
+                ingest_drop(path, data_processor)
+            except ValueError as e:
+                print(f"{os.path.basename(path)} rejected: {str(e)}")
+                move_drop(path, 'rejected')
+                continue
+            except Exception as e:
+                # Left in place and retried on the next scan
+                print(f"{os.path.basename(path)} failed: {str(e)}")
+                continue
+            move_drop(path, 'processed')
+        if once:
+            return
+        time.sleep(interval)
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest yearly raw exports into a partitioned dataset")
+    parser.add_argument('--source-dir', default='data')
+    parser.add_argument('--output', default=DATASET_DIR)
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--force', action='store_true', help="Rebuild the whole dataset")
+    parser.add_argument('--watch', metavar='DIR', help="Append delivery files dropped into DIR instead")
+    parser.add_argument('--data-path', default=DEFAULT_DATA_PATH, help="Dataset the dropped rows are appended to")
+    parser.add_argument('--interval', type=float, default=10, help="Seconds between scans of the drop directory")
+    parser.add_argument('--once', action='store_true', help="Scan the drop directory once and exit")
+    args = parser.parse_args()
+    if args.watch:
+        os.makedirs(args.watch, exist_ok=True)
+        watch(args.watch, args.data_path, interval=args.interval, once=args.once)
+        return
+    run_ingest(args.source_dir, args.output, workers=args.workers, force=args.force)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import pandas as pd
+
+# On-disk store of fitted models and their forecast frames
+MODEL_STORE_DIR = 'data/models'
+DEFAULT_MAX_ENTRIES = 200
+DEFAULT_MAX_MB = 1024
+
+def hash_frame(df, columns=None):
+    """Stable content hash of a DataFrame (or selected columns)"""
+    if df is None:
+        return 'none'
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    hashed = pd.util.hash_pandas_object(df, index=False).values
+    sha = hashlib.sha256(hashed.tobytes())
+    sha.update(','.join(map(str, df.columns)).encode())
+    return sha.hexdigest()
+
+def model_to_json(model):
+    """Serialize a fitted Prophet or ridge model"""
+    if getattr(model, 'backend', 'prophet') == 'ridge':
+        return model.to_json()
+    from prophet.serialize import model_to_json as prophet_to_json
+    return prophet_to_json(model)
+
+def model_from_json(text, backend='prophet'):
+    """Deserialize a model written by model_to_json"""
+    if backend == 'ridge':
+        from ridge_model import RidgeModel
+        return RidgeModel.from_json(text)
+    from prophet.serialize import model_from_json as prophet_from_json
+    return prophet_from_json(text)
+
+class ModelStore:
+    def __init__(self, store_dir=MODEL_STORE_DIR, max_entries=DEFAULT_MAX_ENTRIES, max_mb=DEFAULT_MAX_MB):
+        self.store_dir = store_dir
+        self.max_entries = max_entries
+        self.max_bytes = int(max_mb * 1024 * 1024)
+
+    def make_key(self, segment, train_df, holiday_df, params):
+        """Key a model by segment, training data, holiday table and hyperparameters"""
+        parts = {
+            'segment': self._segment_id(segment),
+            'train': hash_frame(train_df, ['ds', 'y', 'cap', 'floor']),
+            'holidays': hash_frame(holiday_df),
+            'params': params
+        }
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _segment_id(self, segment):
+        return [str(s) for s in segment] if isinstance(segment, (tuple, list)) else str(segment)
+
+    def _params_id(self, params):
+        return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _latest_key(self, segment, params, forecast_period=None):
+        """Key of the newest entry for a segment and hyperparameters, optionally with a stored forecast"""
+        segment_id = self._segment_id(segment)
+        params_id = self._params_id(params)
+        latest_key, latest_created = None, None
+        for key, _, _ in self.entries():
+            try:
+                with open(os.path.join(self._entry_dir(key), 'meta.json')) as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if meta.get('segment') != segment_id or meta.get('params') != params_id:
+                continue
+            if forecast_period is not None and not os.path.exists(self._forecast_path(key, forecast_period)):
+                continue
+            if latest_created is None or meta['created'] > latest_created:
+                latest_key, latest_created = key, meta['created']
+        return latest_key
+
+    def latest_model(self, segment, params):
+        """Most recently fitted model for a segment and hyperparameters, whatever data it saw"""
+        latest_key = self._latest_key(segment, params)
+        return self.load_model(latest_key) if latest_key is not None else None
+
+    def latest_forecast(self, segment, params, forecast_period):
+        """Most recent stored forecast for a segment and hyperparameters, possibly from older data"""
+        latest_key = self._latest_key(segment, params, forecast_period)
+        return self.load_forecast(latest_key, forecast_period) if latest_key is not None else None
+
+    def _entry_dir(self, key):
+        return os.path.join(self.store_dir, key)
+
+    def _forecast_path(self, key, forecast_period):
+        return os.path.join(self._entry_dir(key), f"forecast_{forecast_period}.parquet")
+
+    def _touch(self, key):
+        """Mark an entry as recently used for LRU eviction"""
+        try:
+            os.utime(os.path.join(self._entry_dir(key), 'meta.json'))
+        except OSError:
+            pass
+
+    def load_model(self, key):
+        """Return the stored fitted model, or None if it is not in the store"""
+        path = os.path.join(self._entry_dir(key), 'model.json')
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(os.path.join(self._entry_dir(key), 'meta.json')) as f:
+                backend = json.load(f).get('backend', 'prophet')
+            with open(path) as f:
+                model = model_from_json(f.read(), backend)
+        except Exception as e:
+            print(f"Could not load stored model {key}: {str(e)}")
+            return None
+        self._touch(key)
+        return model
+
+    def load_forecast(self, key, forecast_period):
+        """Return the stored forecast frame for a model and horizon (or forecast_name variant), or None"""
+        path = self._forecast_path(key, forecast_period)
+        if not os.path.exists(path):
+            return None
+        try:
+            forecast = pd.read_parquet(path)
+        except Exception as e:
+            print(f"Could not load stored forecast {key}: {str(e)}")
+            return None
+        self._touch(key)
+        return forecast
+
+    def save_model(self, key, model, segment=None, params=None):
+        """Serialize a fitted model into the store and evict old entries if needed"""
+        try:
+            entry_dir = self._entry_dir(key)
+            os.makedirs(entry_dir, exist_ok=True)
+            self._write_atomic(os.path.join(entry_dir, 'model.json'), model_to_json(model))
+            meta = {
+                'segment': self._segment_id(segment),
+                'params': self._params_id(params),
+                'backend': getattr(model, 'backend', 'prophet'),
+                'created': time.time()
+            }
+            self._write_atomic(os.path.join(entry_dir, 'meta.json'), json.dumps(meta, default=str))
+            self.evict()
+        except Exception as e:
+            print(f"Could not store model {key}: {str(e)}")
+
+    def save_forecast(self, key, forecast_period, forecast):
+        """Store the forecast frame next to its model"""
+        try:
+            path = self._forecast_path(key, forecast_period)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            forecast.to_parquet(path + '.tmp', index=False)
+            os.replace(path + '.tmp', path)
+        except Exception as e:
+            print(f"Could not store forecast {key}: {str(e)}")
+
+    def _write_atomic(self, path, text):
+        with open(path + '.tmp', 'w') as f:
+            f.write(text)
+        os.replace(path + '.tmp', path)
+
+    def entries(self):
+        """List (key, last_used, size_in_bytes) for every stored model, oldest first"""
+        if not os.path.isdir(self.store_dir):
+            return []
+        result = []
+        for key in os.listdir(self.store_dir):
+            entry_dir = self._entry_dir(key)
+            meta_path = os.path.join(entry_dir, 'meta.json')
+            if not os.path.exists(meta_path):
+                continue
+            size = sum(
+                os.path.getsize(os.path.join(entry_dir, name)) for name in os.listdir(entry_dir)
+            )
+            result.append((key, os.path.getmtime(meta_path), size))
+        return sorted(result, key=lambda entry: entry[1])
+
+    def evict(self):
+        """Remove least recently used entries until the count and size limits hold"""
+        entries = self.entries()
+        total_bytes = sum(size for _, _, size in entries)
+        while entries and (len(entries) > self.max_entries or total_bytes > self.max_bytes):
+            key, _, size = entries.pop(0)
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            total_bytes -= size
+
+# Shared instance used by the dashboard
+model_store = ModelStore()
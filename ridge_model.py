@@ -0,0 +1,185 @@
+import json
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+
+# Hyperparameters of the ridge backend used by Forecaster
+RIDGE_PARAMS = {
+    'alpha': 1.0,                # Ridge penalty on the seasonal and holiday coefficients
+    'changepoint_alpha': 10.0,   # Ridge penalty on the trend changes
+    'n_changepoints': 10,
+    'changepoint_range': 0.8,    # Changepoints are placed in the first 80% of the history
+    'yearly_order': 10,          # Fourier terms for the yearly seasonality
+    'interval_width': 0.8
+}
+
+def day_numbers(ds):
+    """Days since the epoch for a column of dates"""
+    return pd.to_datetime(pd.Series(ds)).to_numpy().astype('datetime64[D]').astype(np.int64)
+
+class RidgeModel:
+    """Additive trend, weekday, yearly Fourier and holiday regression fitted by ridge least squares
+
+    A fast alternative to Prophet with the same fit / make_future_dataframe / predict
+    interface and the same forecast columns. Components are in containers, so
+    yhat = trend + weekly + yearly + holidays.
+    """
+    backend = 'ridge'
+
+    def __init__(self, holidays=None, alpha=1.0, changepoint_alpha=10.0, n_changepoints=10,
+                 changepoint_range=0.8, yearly_order=10, interval_width=0.8):
+        self.alpha = alpha
+        self.changepoint_alpha = changepoint_alpha
+        self.n_changepoints = n_changepoints
+        self.changepoint_range = changepoint_range
+        self.yearly_order = yearly_order
+        self.interval_width = interval_width
+        self.holiday_days, self.holiday_columns, self.holiday_names = self._expand_holidays(holidays)
+        self.history_dates = None
+        self.coef = None
+        self.sigma = None
+
+    def _expand_holidays(self, holidays):
+        """(day number, feature column) pairs for every holiday day including its window"""
+        if holidays is None or len(holidays) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), []
+        names = sorted(holidays['holiday'].unique())
+        columns = pd.Index(names).get_indexer(holidays['holiday'])
+        days = day_numbers(holidays['ds'])
+        lower = holidays['lower_window'].fillna(0).astype(int).to_numpy() if 'lower_window' in holidays else np.zeros(len(days), dtype=int)
+        upper = holidays['upper_window'].fillna(0).astype(int).to_numpy() if 'upper_window' in holidays else np.zeros(len(days), dtype=int)
+        expanded_days, expanded_columns = [], []
+        for offset in range(int(lower.min()), int(upper.max()) + 1):
+            in_window = (lower <= offset) & (offset <= upper)
+            expanded_days.append(days[in_window] + offset)
+            expanded_columns.append(columns[in_window])
+        return np.concatenate(expanded_days), np.concatenate(expanded_columns), names
+
+    def _feature_blocks(self, days):
+        """Design matrix and the column slices of each component"""
+        t = (days - self.t0) / self.t_scale
+        blocks = {
+            'trend': [np.ones_like(t), t] + [np.maximum(t - c, 0) for c in self.changepoints],
+            # Monday is the baseline day
+            'weekly': [(((days + 3) % 7) == dow).astype(float) for dow in range(1, 7)],
+            'yearly': []
+        }
+        angle = 2 * np.pi * days / 365.25
+        for k in range(1, self.yearly_order + 1):
+            blocks['yearly'] += [np.sin(k * angle), np.cos(k * angle)]
+
+        holiday_features = np.zeros((len(self.holiday_names), len(days)))
+        positions = pd.Index(days).get_indexer(self.holiday_days)
+        found = positions >= 0
+        holiday_features[self.holiday_columns[found], positions[found]] = 1
+        blocks['holidays'] = list(holiday_features)
+
+        slices, start = {}, 0
+        for name, columns in blocks.items():
+            slices[name] = slice(start, start + len(columns))
+            start += len(columns)
+        X = np.column_stack([column for columns in blocks.values() for column in columns])
+        return X, slices
+
+    def _penalty(self, slices, n_features):
+        penalty = np.full(n_features, self.alpha, dtype=float)
+        # Intercept and base slope are not shrunk
+        penalty[slices['trend']] = self.changepoint_alpha
+        penalty[:2] = 1e-8
+        return penalty
+
+    def fit(self, df):
+        """Fit on a ds/y frame; returns the model like Prophet.fit"""
+        models = self.fit_many(df['ds'], df[['y']].to_numpy(dtype=float), template=self)
+        self.__dict__.update(models[0].__dict__)
+        return self
+
+    @classmethod
+    def fit_many(cls, ds, Y, template=None, **params):
+        """Fit one model per column of Y (days x segments) with a single solve
+
+        Every column shares the dates ds, so the design matrix and its factorization
+        are computed once and thousands of segments fit in one call.
+        """
+        template = template or cls(**params)
+        days = day_numbers(ds)
+        Y = np.asarray(Y, dtype=float).reshape(len(days), -1)
+
+        t0, t_end = days.min(), days.max()
+        t_scale = max(t_end - t0, 1)
+        cut = np.quantile((days - t0) / t_scale, template.changepoint_range) if len(days) else 0
+        changepoints = np.linspace(0, cut, template.n_changepoints + 1)[1:] if template.n_changepoints else np.empty(0)
+
+        fitted = cls.__new__(cls)
+        fitted.__dict__.update(template.__dict__)
+        fitted.t0, fitted.t_scale, fitted.changepoints = int(t0), int(t_scale), changepoints
+        X, slices = fitted._feature_blocks(days)
+
+        # Scale each segment so the penalties do not depend on its volume
+        y_scale = np.abs(Y).max(axis=0)
+        y_scale[y_scale == 0] = 1
+        gram = X.T @ X + np.diag(fitted._penalty(slices, X.shape[1]))
+        coef = np.linalg.solve(gram, X.T @ (Y / y_scale)) * y_scale
+        residuals = Y - X @ coef
+        dof = max(len(days) - X.shape[1], 1)
+        sigma = np.sqrt((residuals ** 2).sum(axis=0) / dof)
+
+        fitted.history_dates = pd.to_datetime(pd.Series(ds)).reset_index(drop=True)
+        models = []
+        for i in range(Y.shape[1]):
+            model = cls.__new__(cls)
+            model.__dict__.update(fitted.__dict__)
+            model.coef = coef[:, i]
+            model.sigma = float(sigma[i])
+            models.append(model)
+        return models
+
+    @staticmethod
+    def predict_many(models, ds):
+        """yhat of models fitted together by fit_many, as a days x models array"""
+        X, _ = models[0]._feature_blocks(day_numbers(ds))
+        return X @ np.column_stack([model.coef for model in models])
+
+    def make_future_dataframe(self, periods, include_history=True):
+        """Daily dates after the last training date, like Prophet.make_future_dataframe"""
+        last = self.history_dates.max()
+        future = pd.date_range(start=last + pd.Timedelta(days=1), periods=periods, freq='D')
+        dates = pd.concat([self.history_dates, pd.Series(future)]) if include_history else pd.Series(future)
+        return pd.DataFrame({'ds': dates.reset_index(drop=True)})
+
+    def predict(self, df):
+        """Forecast with the trend, weekly, yearly and holidays components and an interval"""
+        if self.coef is None:
+            raise ValueError("Model has not been fit")
+        ds = pd.to_datetime(df['ds']).reset_index(drop=True)
+        X, slices = self._feature_blocks(day_numbers(ds))
+        forecast = pd.DataFrame({'ds': ds})
+        for name, columns in slices.items():
+            forecast[name] = X[:, columns] @ self.coef[columns]
+        forecast['additive_terms'] = forecast['weekly'] + forecast['yearly'] + forecast['holidays']
+        forecast['multiplicative_terms'] = 0.0
+        forecast['yhat'] = forecast['trend'] + forecast['additive_terms']
+        z = NormalDist().inv_cdf(0.5 + self.interval_width / 2)
+        forecast['yhat_lower'] = forecast['yhat'] - z * self.sigma
+        forecast['yhat_upper'] = forecast['yhat'] + z * self.sigma
+        return forecast
+
+    def to_json(self):
+        state = dict(self.__dict__)
+        for name, value in state.items():
+            if isinstance(value, np.ndarray):
+                state[name] = value.tolist()
+        state['history_dates'] = [d.strftime('%Y-%m-%d') for d in self.history_dates]
+        return json.dumps(state)
+
+    @classmethod
+    def from_json(cls, text):
+        state = json.loads(text)
+        model = cls.__new__(cls)
+        for name in ['holiday_days', 'holiday_columns']:
+            state[name] = np.asarray(state[name], dtype=np.int64)
+        for name in ['changepoints', 'coef']:
+            state[name] = np.asarray(state[name], dtype=float)
+        state['history_dates'] = pd.to_datetime(pd.Series(state['history_dates']))
+        model.__dict__.update(state)
+        return model
@@ -0,0 +1,61 @@
+import numpy as np
+
+# Columns whose values get precomputed row groups; year is derived from delivery_date
+ROW_INDEX_DIMENSIONS = ['order_type', 'year', 'time_of_day', 'container_type', 'hub_location']
+
+class RowIndex:
+    """Sorted row positions of a frame grouped by each filter dimension
+
+    Filters are resolved by intersecting these position arrays, so selecting rows
+    never scans or copies the whole frame.
+    """
+    def __init__(self, groups, n_rows):
+        self.groups = groups
+        self.n_rows = n_rows
+
+    @classmethod
+    def from_frame(cls, df):
+        """Group the row positions of every indexed dimension present in the frame"""
+        dtype = np.int32 if len(df) < np.iinfo(np.int32).max else np.int64
+        groups = {}
+        for dim in ROW_INDEX_DIMENSIONS:
+            if dim == 'year' and 'delivery_date' in df.columns:
+                values = df['delivery_date'].dt.year.astype('Int64')
+            elif dim in df.columns:
+                values = df[dim]
+            else:
+                continue
+            values = values.reset_index(drop=True)
+            indices = values.groupby(values, observed=True, sort=False).indices
+            groups[dim] = {key: positions.astype(dtype) for key, positions in indices.items()}
+        return cls(groups, len(df))
+
+    @property
+    def nbytes(self):
+        return sum(positions.nbytes for members in self.groups.values() for positions in members.values())
+
+    def rows(self, dim, values):
+        """Sorted positions of the rows whose dimension takes any of the values"""
+        if dim not in self.groups:
+            raise KeyError(f"Column {dim} is not indexed")
+        if isinstance(values, str) or not hasattr(values, '__iter__'):
+            values = [values]
+        members = self.groups[dim]
+        parts = [members[value] for value in values if value in members]
+        if not parts:
+            return np.empty(0, dtype=np.int32)
+        # Groups are disjoint, so their union only needs sorting
+        return parts[0] if len(parts) == 1 else np.sort(np.concatenate(parts))
+
+    def select(self, **filters):
+        """Positions of the rows matching every filter, or None when nothing is filtered
+
+        A filter value of None means all members, e.g. select(order_type=['S', 'W'], hub_location=None).
+        """
+        selected = None
+        for dim, values in filters.items():
+            if values is None:
+                continue
+            positions = self.rows(dim, values)
+            selected = positions if selected is None else np.intersect1d(selected, positions, assume_unique=True)
+        return selected
@@ -0,0 +1,110 @@
+"""Typed dataset shared read-only by every session and process on a machine.
+
+Each version of the loaded dataset is published once as an uncompressed Arrow IPC file
+next to the cache. Processes memory-map the file, so the date, plain integer, float
+and category columns of every process are backed by the same page cache pages, and
+only the pages that are read become resident. The nullable integer columns (delivery
+times, weekday and ISO week) are converted, so each process holds its own copy of
+them. Within a process all sessions share one frame.
+
+Sessions hold a lease on the version they loaded. When a new version is published,
+new loads attach to it, and a process drops the old frame once its last lease is
+released. The old file is deleted right after publishing; processes that still map it
+keep its pages until they let go of it.
+"""
+import os
+import glob
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+class SharedDataset:
+    """Process-wide registry of memory-mapped dataset versions with leases per version"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.frames = {}
+        self.leases = {}
+        # Latest version attached per dataset, kept even without leases
+        self.current = {}
+
+    @staticmethod
+    def path(prefix, version):
+        return f"{prefix}.{version}.arrow"
+
+    def publish(self, prefix, version, df):
+        """Write a frame as the shared file of a dataset version and delete the older versions' files"""
+        path = self.path(prefix, version)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+        for old_path in glob.glob(self.path(glob.escape(prefix), '*')):
+            if old_path != path:
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    # Still mapped on platforms that don't allow deleting open files
+                    pass
+        return path
+
+    @staticmethod
+    def attach(path):
+        """Read-only frame over a memory-mapped file; only the nullable integer columns are copied"""
+        table = ipc.open_file(pa.memory_map(path, 'r')).read_all()
+        return table.to_pandas(split_blocks=True)
+
+    def acquire(self, prefix, version, build):
+        """Shared frame of a dataset version and a lease on it
+
+        The first process to ask for a version publishes it from build(). Callers must
+        not modify the frame, and must call release with the same arguments when done.
+        """
+        key = (prefix, version)
+        with self.lock:
+            if key not in self.frames:
+                path = self.path(prefix, version)
+                if not os.path.exists(path):
+                    self.publish(prefix, version, build())
+                self.frames[key] = self.attach(path)
+                self.leases[key] = 0
+                previous = self.current.get(prefix)
+                self.current[prefix] = version
+                if previous is not None and previous != version:
+                    self._drop_if_unused((prefix, previous))
+            self.leases[key] += 1
+            return self.frames[key]
+
+    def release(self, prefix, version):
+        """Give back a lease; a superseded version is dropped with its last lease"""
+        key = (prefix, version)
+        with self.lock:
+            if key not in self.leases:
+                return
+            self.leases[key] -= 1
+            self._drop_if_unused(key)
+
+    def _drop_if_unused(self, key):
+        prefix, version = key
+        if self.leases.get(key, 0) <= 0 and self.current.get(prefix) != version:
+            self.frames.pop(key, None)
+            self.leases.pop(key, None)
+
+    def report(self):
+        """Attached versions with their lease counts and the bytes they map"""
+        with self.lock:
+            return [
+                {'dataset': prefix, 'version': version, 'leases': self.leases[(prefix, version)],
+                 'mapped_bytes': os.path.getsize(self.path(prefix, version))
+                 if os.path.exists(self.path(prefix, version)) else None}
+                for prefix, version in self.frames
+            ]
+
+def select_columns(df, columns):
+    """Columns of a shared frame without copying them, unlike df[columns]"""
+    return pd.DataFrame({col: df[col] for col in columns}, copy=False)
+
+# Shared instance used by every data processor in the process
+shared_dataset = SharedDataset()
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+from data_processor import DataProcessor
+
+def raw_orders(order_ids, dates):
+    """Orders in the raw export columns, one per id, on the given days"""
+    n = len(order_ids)
+    dates = pd.to_datetime(pd.Series(dates))
+    return pd.DataFrame({
+        'LiefKWJ': dates.dt.year, 'Monat': dates.dt.month, 'LiefDatum': dates.dt.strftime('%Y-%m-%d'),
+        'LiefZeitV': '07:00:00', 'LiefZeitB': '09:00:00', 'CVgId': list(order_ids), 'Typ': 'Firma',
+        'LoAdrId': 1000000, 'LoPlz': 22525.0, 'LoOrt': 'Hamburg', 'DspGrpKz': 'M', 'DspZenKz': 'HH',
+        'AArtKz': 'L', 'ConTyp': 'M05', 'CSAnz': np.ones(n, dtype=int), 'CHAnz': 0, 'FzgNr': '0236',
+        'Bez': 'Holz', 'Plz': 22525.0, 'Ort': 'Hamburg',
+        'AddDatum': (dates - pd.Timedelta(days=2)).dt.strftime('%Y-%m-%d') + ' 08:00:00',
+        'EntPlz': 22525, 'EntOrt': 'Hamburg'
+    })
+
+def test_rebuilt_source_drops_orders_already_in_tails(tmp_path):
+    csv = tmp_path / 'orders.csv'
+    days = pd.date_range('2024-01-01', '2024-01-10', freq='D')
+    raw_orders(range(1, 101), np.resize(days, 100)).to_csv(csv, index=False)
+    processor = DataProcessor(str(csv), cache_dir=str(tmp_path / 'cache'), shared=False)
+    assert len(processor.load_data()) == 100
+
+    # 50 new orders, then a rewritten export that already holds those up to its last day
+    new = raw_orders(range(101, 151), np.resize(pd.date_range('2024-01-09', '2024-01-12', freq='D'), 50))
+    assert len(processor.append_rows(new)) == 50
+    overlap = new[new['LiefDatum'] <= '2024-01-10']
+    pd.concat([raw_orders(range(1, 101), np.resize(days, 100)), overlap]).to_csv(csv, index=False)
+
+    df = DataProcessor(str(csv), cache_dir=str(tmp_path / 'cache'), shared=False).load_data()
+    assert len(df) == 150
+    assert df['order_id'].is_unique
+
+def test_cached_cube_counts_its_bytes(tmp_path):
+    from frame_cache import frame_nbytes
+
+    csv = tmp_path / 'orders.csv'
+    raw_orders(range(1, 101), np.resize(pd.date_range('2024-01-01', '2024-01-10', freq='D'), 100)).to_csv(csv, index=False)
+    processor = DataProcessor(str(csv), cache_dir=str(tmp_path / 'cache'), shared=False)
+    processor.load_data()
+    cube = processor.get_demand_cube()
+    assert frame_nbytes(cube) == cube.cube.memory_usage(deep=True).sum() > 0
+
+def test_touching_the_source_keeps_the_dataset_version(tmp_path):
+    import os
+
+    csv = tmp_path / 'orders.csv'
+    raw_orders(range(1, 11), pd.date_range('2024-01-01', periods=10, freq='D')).to_csv(csv, index=False)
+    processor = DataProcessor(str(csv), cache_dir=str(tmp_path / 'cache'), shared=False)
+    processor.load_data()
+    fingerprint = processor.fingerprint
+    stat = os.stat(csv)
+    os.utime(csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    processor.load_data()
+    assert processor.fingerprint == fingerprint
+
+def test_holidays_cover_the_year_after_the_data(tmp_path):
+    csv = tmp_path / 'orders.csv'
+    raw_orders(range(1, 31), pd.date_range('2024-12-01', '2024-12-30', freq='D')).to_csv(csv, index=False)
+    processor = DataProcessor(str(csv), cache_dir=str(tmp_path / 'cache'), shared=False)
+    processor.load_data()
+    holidays = processor.get_holiday_data(hub='HH')
+    assert pd.Timestamp('2025-01-01') in set(holidays['ds'])
+    assert holidays['ds'].max() >= pd.Timestamp('2025-12-25')
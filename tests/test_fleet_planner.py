@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+from fleet_planner import FleetProfile
+
+def make_profile(group_demand, capacity):
+    dates = pd.date_range('2025-01-01', periods=10, freq='D')
+    demand = np.tile(np.asarray(group_demand, dtype=float), (len(dates), 1, 1))
+    fleet_size = np.ones((1, len(capacity)), dtype=np.int32)
+    return FleetProfile(dates, pd.Index(['HH']), pd.Index([f"G{i}" for i in range(len(capacity))]),
+                        demand, np.asarray(capacity, dtype=float), fleet_size)
+
+def test_trucks_match_single_capacity_rule():
+    profile = make_profile([[5, 5, 5]], [4, 4, 4])
+    for containers in [0, 1, 2, 3, 4, 5, 8, 12, 13, 24]:
+        assert profile.trucks(containers, hub='HH') == int(np.ceil(containers / 4))
+        assert profile.trucks(containers) == int(np.ceil(containers / 4))
+
+def test_trucks_by_group_adds_up_to_total():
+    profile = make_profile([[6, 3, 1]], [4, 4, 4])
+    containers = np.arange(0, 30)
+    by_group = profile.trucks_by_group(containers, hub='HH')
+    assert (by_group.sum(axis=-1) == np.ceil(containers / 4)).all()
+    assert (by_group >= 0).all()
+
+def test_trucks_weight_capacities():
+    # Half the containers go to trucks of 2 and half to trucks of 8
+    profile = make_profile([[1, 1]], [2, 8])
+    assert profile.trucks(8, hub='HH') == 3
+    assert profile.trucks(1, hub='HH') == 1
@@ -0,0 +1,19 @@
+import threading
+
+from forecast_jobs import ForecastJobs
+
+def test_sessions_are_forgotten_when_their_jobs_end():
+    jobs = ForecastJobs(max_workers=1)
+    release = threading.Event()
+    running = jobs.submit('a', 'slow', release.wait, 5)
+    queued = jobs.submit('b', 'queued', lambda: 'b')
+    # Session b moves on, so its queued job is cancelled
+    assert jobs.submit('b', 'slow', lambda: None) is running
+    assert queued.cancelled()
+    release.set()
+    running.result(timeout=5)
+    assert jobs.stats()['sessions'] == 0
+
+    # A finished key is served from the results without tracking the session
+    assert jobs.submit('c', 'slow', lambda: None).result() is True
+    assert jobs.stats()['sessions'] == 0